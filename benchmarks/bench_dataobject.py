@@ -0,0 +1,187 @@
+"""
+Benchmarks for building and serializing data objects.
+
+Times each stage of building a DataObject and an AdditiveDataObject
+over a range of sizes, smoothing and limits, then the whole /make
+route through the Flask test client, and writes the timings to JSON.
+Given a baseline JSON from an earlier run, anything slower than the
+baseline by more than the threshold is reported, and the exit status
+is 1.
+
+    python -m benchmarks.bench_dataobject -o bench.json
+    python -m benchmarks.bench_dataobject -o new.json --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+from make_a_data_object.resampling import resample
+
+SIZES = (100, 450, 1000, 2000)
+ALPHAS = (0, 5, 20)
+LIMITS = (10, 20, None)
+
+
+def best(function, repeat=5, number=None):
+    """Best time of one call to function, in seconds."""
+    timer = timeit.Timer(function)
+    if number is None:
+        number, _ = timer.autorange()
+        number = max(1, number // 10)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_stages(cls, size, alpha, limit, repeat=5):
+    """Time the stages of building and serializing one object."""
+    data_object = cls(Data.a, Data.p, 12, size=size, limit=limit, alpha=alpha)
+    abstract_v = data_object.vectorize_abstract(Data.a, limit)
+    surface = np.empty_like(data_object.surface)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'dataobject.dat')
+
+        raw = data_object.calculate_surface(data_object.border, data_object.abstract,
+                                            data_object.precipitation, alpha=alpha)
+
+        def clip():
+            """Scaling and clipping, on a fresh copy of the raw surface."""
+            np.copyto(surface, raw)
+            data_object.scale_and_clip(surface)
+
+        stages = {
+            'construct': lambda: cls(Data.a, Data.p, 12, size=size, limit=limit, alpha=alpha),
+            'vectorize_abstract': lambda: data_object.vectorize_abstract(Data.a, limit),
+            'interpolation': lambda: (resample(abstract_v, data_object.data_size),
+                                      resample(Data.p, data_object.data_size)),
+            'sun': lambda: data_object.daylight_profile(data_object.data_size, 12),
+            'calculate_surface': lambda: data_object.calculate_surface(
+                data_object.border, data_object.abstract, data_object.precipitation,
+                alpha=alpha, out=surface),
+            'clipping': clip,
+            'str': lambda: str(data_object),
+            'write': lambda: data_object.write(filename),
+            'get_complement': data_object.get_complement,
+        }
+        slow = ('str', 'write')
+        return {stage: best(function, repeat, 1 if stage in slow and size >= 1000 else None)
+                for stage, function in stages.items()}
+
+
+def bench_make(requests=20):
+    """Requests per second through the /make route, with an empty cache."""
+    import make_a_data_object
+    from make_a_data_object import routes
+    make_a_data_object.app.testing = True
+    make_a_data_object.app.logger.setLevel(30)
+    client = make_a_data_object.app.test_client()
+    form = {'abstract': Data.a, 'daylength': "12:30", 'smoothing': "", 'limit': ""}
+    results = {}
+    for fmt in ('dat', 'npy', 'stl'):
+        routes.result_cache.entries.clear()
+        routes.result_cache.bytes = 0
+        start = time.perf_counter()
+        for i in range(requests):
+            # Different precipitation each time, so that nothing is cached
+            precipitation = ", ".join(map(str, [Data.p[0] + i] + Data.p[1:]))
+            client.post('/make', data=dict(form, precipitation=precipitation, format=fmt)).data
+        results['make/{}/requests_per_second'.format(fmt)] = requests / (time.perf_counter() - start)
+    return results
+
+
+def bench_import(repeat=3):
+    """Seconds to import the app in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import make_a_data_object; print(time.perf_counter() - t)"
+    return min(float(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                                    text=True).stdout) for _ in range(repeat))
+
+
+def run(sizes=SIZES, alphas=ALPHAS, limits=LIMITS, repeat=5, requests=20):
+    """Run the benchmarks, returning {name: value}.
+
+    Values ending in _per_second are better higher, the rest are
+    seconds and better lower."""
+    results = {'import/seconds': bench_import()}
+    for cls in (DataObject, AdditiveDataObject):
+        for size in sizes:
+            for alpha in alphas:
+                for limit in limits:
+                    stages = bench_stages(cls, size, alpha, limit, repeat)
+                    for stage, seconds in stages.items():
+                        name = "{}/size={}/alpha={}/limit={}/{}".format(
+                            cls.__name__, size, alpha, limit, stage)
+                        results[name] = seconds
+    results.update(bench_make(requests))
+    return results
+
+
+def compare(results, baseline, threshold=1.5):
+    """Regressions against a baseline.
+
+    Returns
+    -------
+    list of tuple
+        Name, baseline value, value and slowdown, for each benchmark
+        slower than the baseline by more than threshold times
+    """
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        if name.endswith('_per_second'):
+            slowdown = baseline[name] / value
+        else:
+            slowdown = value / baseline[name]
+        if slowdown > threshold:
+            regressions.append((name, baseline[name], value, slowdown))
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='JSON file of earlier results to compare to')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='how many times slower is a regression (default 1.5)')
+    parser.add_argument('--quick', action='store_true',
+                        help='only size 100 and 450, default alpha and limit')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        results = run(sizes=(100, 450), alphas=(5,), limits=(20,), repeat=3, requests=5)
+    else:
+        results = run()
+    report = {'meta': {'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as fd:
+            baseline = json.load(fd)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, slowdown in regressions:
+            print("REGRESSION {}: {:.6g} -> {:.6g} ({:.2f}x)".format(name, before, after, slowdown),
+                  file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
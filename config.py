@@ -3,4 +3,27 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config(object):
     DEBUG = True
-
+    # Memory budget for cached /make results, and optional disk tier
+    RESULT_CACHE_BYTES = 64 * 2**20
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR')
+    RESULT_CACHE_DISK_BYTES = 2**30
+    # Where the index page looks up the day length, and how long it waits
+    SUNRISE_SUNSET_ENDPOINT = 'https://api.sunrise-sunset.org/json'
+    SUNRISE_SUNSET_TIMEOUT = 2
+    # Objects larger than this, or asked for with mode=async, are built
+    # by a pool of worker processes in the background
+    ASYNC_SIZE_THRESHOLD = 1000
+    # Largest size asked for, about 200 MB a surface in float64
+    MAX_SIZE = 5000
+    JOB_WORKERS = 2
+    JOB_QUEUE_SIZE = 8
+    JOB_TIMEOUT = 300
+    # Where jobs write the objects built tiled, None for the temporary directory
+    JOB_RESULT_DIR = os.environ.get('JOB_RESULT_DIR')
+    # Width and height of the live previews of the objects
+    PREVIEW_SIZE = 64
+    # Per stage timings served at /metrics, and memory too if tracing.
+    # Server-Timing headers for every response, not only when asked for
+    METRICS_ENABLED = True
+    METRICS_TRACE_MEMORY = False
+    SERVER_TIMING = False
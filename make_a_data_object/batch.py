@@ -0,0 +1,168 @@
+"""
+Batch generation of data objects.
+
+Reads parameter sets from a JSONL or CSV file, one object per line, and
+builds the objects in a pool of processes, writing each to disk as soon
+as it is done. A failing object is reported, and the rest of the batch
+carries on.
+
+    python -m make_a_data_object.batch visitors.csv -o objects -j 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from make_a_data_object.models import AdditiveDataObject, DefaultParameters
+from make_a_data_object.serializers import FORMATS
+from make_a_data_object.tiled import TILED_SIZE, tiled_data_object
+
+
+def read_parameters(filename):
+    """Parameter sets from a .jsonl file, or a .csv file with a header.
+
+    Precipitation may be given as a list, or as a comma separated
+    string like in the web form. So may day length, as hours:minutes.
+    """
+    with open(filename, newline='') as fd:
+        if filename.endswith('.csv'):
+            return [dict(row) for row in csv.DictReader(fd)]
+        return [json.loads(line) for line in fd if line.strip()]
+
+
+def normalize(params, index=0):
+    """Parameter set with types fixed and defaults filled in."""
+    precipitation = params['precipitation']
+    if isinstance(precipitation, str):
+        precipitation = [float(p) for p in precipitation.split(',')]
+    daylength = params['daylength']
+    if isinstance(daylength, str):
+        daylength = float(daylength.replace(':', '.'))
+    fmt = params.get('format') or DefaultParameters.format
+
+    complement = params.get('complement')
+    if not isinstance(complement, bool):
+        # CSV gives strings, and "False" or "0" must not make a complement
+        complement = str(complement or '').strip().lower() in ('1', 'true', 'on', 'yes')
+
+    def optional(name, kind, default):
+        value = params.get(name)
+        return default if value in (None, '') else kind(value)
+
+    return {
+        'abstract': params['abstract'],
+        'precipitation': [float(p) for p in precipitation],
+        'daylength': float(daylength),
+        'size': optional('size', int, DefaultParameters.size),
+        'base': optional('base', int, 50),
+        'border': optional('border', int, 25),
+        'limit': optional('limit', int, DefaultParameters.limit),
+        'alpha': optional('alpha', int, DefaultParameters.smoothing),
+        'format': fmt,
+        'precision': optional('precision', int, DefaultParameters.precision),
+        'complement': complement,
+        'tolerance': optional('tolerance', float, DefaultParameters.tolerance),
+        'filename': params.get('filename') or 'dataobject-{:04}{}'.format(index, FORMATS[fmt].extension),
+    }
+
+
+def build(params, directory):
+    """Build one data object and write it to directory.
+
+    Runs in a worker process. Exceptions are returned rather than
+    raised, so that the batch can go on.
+
+    Returns
+    -------
+    dict
+        The file written, seconds taken, and the error if any
+    """
+    start = time.perf_counter()
+    result = {'filename': None, 'seconds': None, 'error': None}
+    try:
+        filename = os.path.join(directory, params['filename'])
+        result['filename'] = filename
+        # Large objects are made in blocks of rows, in a temporary file
+        build_object = tiled_data_object if params['size'] >= TILED_SIZE else AdditiveDataObject
+        data_object = build_object(
+            params['abstract'], params['precipitation'], params['daylength'],
+            size=params['size'], base=params['base'], border=params['border'],
+            limit=params['limit'], alpha=params['alpha'])
+        data_object.write(filename, precision=params['precision'], fmt=params['format'],
+                          complement=params['complement'], tolerance=params['tolerance'])
+    except Exception as e:
+        result['error'] = "{}: {}".format(e.__class__.__name__, e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def generate_batch(param_sets, directory, processes=None):
+    """Build data objects in parallel, writing them to directory.
+
+    Each worker process keeps its imports and caches from one object
+    to the next, so only the first object in each pays for those.
+
+    Parameters
+    ----------
+    param_sets : list of dict
+        Parameter sets, as accepted by normalize
+    directory : string
+        Where to write the objects
+    processes : int
+        Number of worker processes (default number of CPUs)
+
+    Yields
+    ------
+    dict
+        Result of each object, in the order they finish, with the index
+        of its parameter set
+    """
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(processes) as pool:
+        futures = {}
+        for index, params in enumerate(param_sets):
+            try:
+                future = pool.submit(build, normalize(params, index), directory)
+            except (KeyError, ValueError, TypeError) as e:
+                yield {'index': index, 'filename': None, 'seconds': 0,
+                       'error': "{}: {}".format(e.__class__.__name__, e)}
+                continue
+            futures[future] = index
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died, not just the object in it
+                result = {'filename': None, 'seconds': None,
+                          'error': "{}: {}".format(e.__class__.__name__, e)}
+            yield dict(result, index=futures[future])
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('parameters', help='.jsonl or .csv file of parameter sets')
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    parser.add_argument('-j', '--processes', type=int, help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    failures = 0
+    results = generate_batch(read_parameters(args.parameters), args.output, args.processes)
+    for result in results:
+        if result['error']:
+            failures += 1
+            print("{index}\tFAILED\t{error}".format(**result))
+        else:
+            print("{index}\t{filename}\t{seconds:.2f}s".format(**result))
+    print("Done in {:.2f}s, {} failed".format(time.perf_counter() - start, failures),
+          file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
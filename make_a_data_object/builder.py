@@ -0,0 +1,148 @@
+"""
+Incremental building of data objects.
+
+Interactive users change one input at a time, like the smoothing while
+moving a slider, and most of the object stays the same. The builder
+keeps the result of each stage of building an object, and redoes only
+the stages downstream of what changed:
+
+    abstract, limit, encoding            -> abstract vector
+    abstract vector, size, border        -> resampled abstract
+    precipitation, daylength, size, ...  -> signal, resampled with sun
+    abstract, signal, alpha, method, ... -> surface, blurred and combined
+    surface, base                        -> scaled and clipped surface
+
+Changing alpha, for example, only blurs and clips again.
+
+    builder = DataObjectBuilder(abstract=..., precipitation=..., daylength=12)
+    data_object = builder.build()
+    data_object = builder.build(alpha=8)
+"""
+
+import copy
+import numpy as np
+from make_a_data_object.instrumentation import stage
+from make_a_data_object.models import AdditiveDataObject
+from make_a_data_object.resampling import resample
+
+
+class DataObjectBuilder:
+    """Builds data objects, keeping the stages in between for the next."""
+    # Each stage with the parameters and the stages it is made of, in order
+    STAGES = {
+        'abstract_vector': (('abstract', 'limit', 'encoding'), ()),
+        'abstract': (('size', 'border'), ('abstract_vector',)),
+        'signal': (('precipitation', 'daylength', 'size', 'border'), ()),
+        'surface': (('size', 'border', 'alpha', 'method', 'dtype'), ('abstract', 'signal')),
+        'clipped': (('size', 'base'), ('surface',)),
+    }
+    DEFAULTS = {'size': 450, 'base': 50, 'border': 25, 'limit': None, 'alpha': None,
+                'method': 'separable', 'dtype': np.float64, 'encoding': 'wordlength'}
+
+    def __init__(self, cls=AdditiveDataObject, **params):
+        """The constructor.
+
+        Parameters
+        ----------
+        cls : type
+            The DataObject class to build (default AdditiveDataObject)
+        params
+            Arguments of the cls constructor, which can also be given
+            or changed later, in update or build
+        """
+        self.cls = cls
+        self.params = dict(self.DEFAULTS)
+        self.results = {}
+        self.inputs = {}
+        # How many times each stage has been made, handy for testing
+        self.runs = dict.fromkeys(self.STAGES, 0)
+        self.update(**params)
+
+    def __repr__(self):
+        """Printable representation."""
+        return "{} of {} with {} stages made".format(self.__class__, self.cls.__name__,
+                                                     len(self.results))
+
+    def update(self, **params):
+        """Change some of the parameters."""
+        unknown = set(params) - set(self.DEFAULTS) - {'abstract', 'precipitation', 'daylength'}
+        if unknown:
+            raise TypeError("unknown parameters {}".format(", ".join(sorted(unknown))))
+        self.params.update(params)
+        return self
+
+    @staticmethod
+    def same(a, b):
+        """Whether two parameter values are equal, arrays included."""
+        if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            return np.array_equal(a, b)
+        return a == b
+
+    def stale(self, name, changed):
+        """Whether stage name has to be made again."""
+        names, upstream = self.STAGES[name]
+        if name not in self.results or changed.intersection(upstream):
+            return True
+        return not all(self.same(self.params[param], value)
+                       for param, value in zip(names, self.inputs[name]))
+
+    def build(self, **params):
+        """Build the data object, after changing params if given.
+
+        Objects built in a row share the arrays of the stages which did
+        not change, so they should not be modified in place.
+
+        Returns
+        -------
+        DataObject
+            An instance of cls, like cls(**params) would make
+        """
+        self.update(**params)
+        p = self.params
+        self.cls.check_arguments(p['abstract'], p['precipitation'], p['size'], p['border'],
+                                 p['limit'], p['alpha'])
+        data_object = self.cls.__new__(self.cls)
+        data_object.size = p['size']
+        data_object.base = p['base']
+        data_object.border = p['border']
+        data_object.daylength = p['daylength']
+
+        changed = set()
+        for name, (names, upstream) in self.STAGES.items():
+            if self.stale(name, changed):
+                with stage('build_{}'.format(name)):
+                    self.results[name] = getattr(self, 'make_{}'.format(name))(data_object)
+                # Copied, as lists given in may be changed in place later
+                self.inputs[name] = [copy.copy(p[param]) for param in names]
+                self.runs[name] += 1
+                changed.add(name)
+
+        data_object.abstract = self.results['abstract']
+        data_object.precipitation = self.results['signal']
+        data_object.surface = self.results['clipped']
+        return data_object
+
+    def make_abstract_vector(self, data_object):
+        """Vector of the abstract, up to limit words."""
+        return self.cls.vectorize_abstract(self.params['abstract'], limit=self.params['limit'],
+                                           encoding=self.params['encoding'])
+
+    def make_abstract(self, data_object):
+        """The abstract vector resampled to the data size."""
+        return resample(self.results['abstract_vector'], data_object.data_size)
+
+    def make_signal(self, data_object):
+        """The precipitation resampled to the data size, with sun."""
+        return data_object.signal(self.params['precipitation'], self.params['daylength'])
+
+    def make_surface(self, data_object):
+        """The blurred and combined surface, before scaling."""
+        surface = np.empty((data_object.size, data_object.size), dtype=self.params['dtype'])
+        return data_object.calculate_surface(data_object.border, self.results['abstract'],
+                                             self.results['signal'], alpha=self.params['alpha'],
+                                             method=self.params['method'], out=surface)
+
+    def make_clipped(self, data_object):
+        """The surface scaled and clipped."""
+        # The surface is kept as it is, for when only the base changes
+        return data_object.scale_and_clip(self.results['surface'].copy())
@@ -0,0 +1,175 @@
+"""
+Cache of finished results.
+
+Results are keyed on a hash of the normalized parameters, so that a
+repeated request skips both building the object and serializing it.
+Serialized results are kept in memory, least recently used first out
+when over the memory budget, and optionally also on disk, with a budget
+of its own.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """LRU cache of serialized results, with an optional disk tier."""
+    def __init__(self, max_bytes=64 * 2**20, directory=None, max_disk_bytes=2**30):
+        """The constructor.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Memory budget for the cached results (default 64 MiB)
+        directory : string
+            Directory for keeping results on disk too. None (default)
+            for memory only
+        max_disk_bytes : int
+            Budget for the results on disk, least recently used are
+            deleted first when over it (default 1 GiB)
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        """Printable representation."""
+        return "{} with {} entries in {} bytes".format(self.__class__, len(self.entries), self.bytes)
+
+    @staticmethod
+    def key(**params):
+        """Hash of the parameters.
+
+        Numpy arrays and other sequences are normalized to lists of
+        floats, so that equal inputs hash equally whatever their type.
+        """
+        def normalize(value):
+            if hasattr(value, '__len__') and not isinstance(value, str):
+                return [float(v) for v in value]
+            return value
+
+        normalized = {name: normalize(value) for name, value in params.items()}
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        """Path to the file of key in the disk tier."""
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Cached result for key, or None."""
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory:
+            try:
+                with open(self.path(key), "rb") as fd:
+                    data = fd.read()
+                # Used now, so it is the last to go from the disk tier
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self.put(key, data, disk=False)
+                with self.lock:
+                    self.hits += 1
+                return data
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data, disk=True):
+        """Cache data for key, evicting the least recently used."""
+        if len(data) <= self.max_bytes:
+            with self.lock:
+                if key in self.entries:
+                    self.bytes -= len(self.entries.pop(key))
+                self.entries[key] = data
+                self.bytes += len(data)
+                while self.bytes > self.max_bytes:
+                    self.bytes -= len(self.entries.popitem(last=False)[1])
+        if disk and self.directory:
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+            self.trim_disk()
+
+    def trim_disk(self):
+        """Delete the least recently used results on disk, until they
+        fit in max_disk_bytes.
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            # Results being written are still in temporary files
+            if entry.is_file() and not entry.name.startswith(tempfile.gettempprefix()):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def tee(self, key, chunks):
+        """Pass chunks through, and cache them once all are through.
+
+        Only results within max_bytes are collected in memory. On disk,
+        the chunks are written as they go, whatever the size.
+        """
+        collected = []
+        size = 0
+        if self.directory:
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            disk = os.fdopen(fd, "wb")
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                size += len(chunk)
+                if size > self.max_bytes:
+                    # Too big to be kept, so stop holding on to it
+                    collected = None
+                elif collected is not None:
+                    collected.append(chunk)
+                if self.directory:
+                    disk.write(chunk)
+                yield chunk
+        except BaseException:
+            # Including the client going away before the end
+            if self.directory:
+                disk.close()
+                os.remove(tmp)
+            raise
+        if collected is not None:
+            self.put(key, b"".join(collected), disk=False)
+        if self.directory:
+            disk.close()
+            os.replace(tmp, self.path(key))
+            self.trim_disk()
+
+    def stats(self):
+        """Hit and miss counters and the size of the cache."""
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'entries': len(self.entries),
+                    'bytes': self.bytes,
+                    'max_bytes': self.max_bytes}
@@ -0,0 +1,109 @@
+"""
+Day length, from the sunrise-sunset.org API or computed locally.
+
+Looked up day lengths are cached per date and rounded location, so the
+API is called at most about once a day per place. A day length from an
+earlier date is still served while it is refreshed in the background,
+and if the API cannot be reached in time, the day length is computed
+from the solar declination instead.
+"""
+
+import datetime
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger()
+
+
+def solar_day_length(date, lat):
+    """Day length in hours at latitude lat on date.
+
+    Uses the solar declination and the standard -0.833 degree altitude
+    of sunrise and sunset, good to a few minutes outside polar regions.
+    """
+    declination = np.radians(-23.44) * np.cos(2 * np.pi / 365 * (date.timetuple().tm_yday + 10))
+    lat = np.radians(lat)
+    cos_hour_angle = ((np.sin(np.radians(-0.833)) - np.sin(lat) * np.sin(declination)) /
+                      (np.cos(lat) * np.cos(declination)))
+    return float(2 * np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1))) / 15)
+
+
+def format_hours(hours):
+    """Hours as a H:MM:SS string, like the API gives day_length."""
+    seconds = int(round(hours * 3600))
+    return "{}:{:02}:{:02}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class DayLengthProvider:
+    """Cached day lengths, looked up from a sunrise-sunset.org style API."""
+    def __init__(self, endpoint='https://api.sunrise-sunset.org/json',
+                 timeout=2, retry_interval=300, digits=2):
+        """The constructor.
+
+        Parameters
+        ----------
+        endpoint : string
+            URL of the API. Anything that answers like
+            sunrise-sunset.org does, a local stub server for example
+        timeout : float
+            Seconds to wait for the API (default 2)
+        retry_interval : float
+            Seconds between attempts to refresh a day length which is
+            stale or computed locally (default 300)
+        digits : int
+            Locations are rounded to this many decimals (default 2)
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.digits = digits
+        # (lat, lng) -> (date, day length, whether it came from the API)
+        self.entries = {}
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, lat, lng, date):
+        """Day length from the API, as a H:MM:SS string."""
+        # Imported here, as the index page usually gets by with the cache
+        import requests
+        callurl = self.endpoint + '?lat={}&lng={}&date={}'.format(lat, lng, date.isoformat())
+        logger.debug('Getting data from {}'.format(callurl))
+        response = requests.get(callurl, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['results']['day_length']
+
+    def refresh(self, location, date):
+        """Look up the day length of location on date, and cache it.
+
+        Falls back on the locally computed day length."""
+        try:
+            entry = (date, self.fetch(*location, date), True)
+        except (ImportError, OSError, ValueError, KeyError) as e:
+            # requests.RequestException is an OSError
+            logger.warning('Day length lookup failed, computing it locally: {}'.format(e))
+            entry = (date, format_hours(solar_day_length(date, location[0])), False)
+        with self.lock:
+            self.entries[location] = entry
+        return entry[1]
+
+    def day_length(self, lat=55.67, lng=12.56, date=None):
+        """Day length at lat, lng on date (default today) as a H:MM:SS string."""
+        date = date or datetime.date.today()
+        location = (round(lat, self.digits), round(lng, self.digits))
+        with self.lock:
+            entry = self.entries.get(location)
+            due = time.monotonic() - self.attempts.get(location, -np.inf) > self.retry_interval
+            if entry is None or ((entry[0] != date or not entry[2]) and due):
+                self.attempts[location] = time.monotonic()
+            else:
+                due = False
+        if entry is None:
+            return self.refresh(location, date)
+        if due:
+            threading.Thread(target=self.refresh, args=(location, date), daemon=True).start()
+        if entry[0] != date and not entry[2]:
+            # A stale fallback is no better than computing it afresh
+            return format_hours(solar_day_length(date, location[0]))
+        return entry[1]
@@ -0,0 +1,146 @@
+"""
+Timing and memory instrumentation of the stages of making an object.
+
+Wrap a stage in `with stage('name') as s:` to record its wall time,
+and set `s.output` to the size of what it made. The totals per stage are
+served in the Prometheus text format. Memory is recorded only while
+tracemalloc is tracing, as tracing slows everything down.
+
+When metrics are disabled and no request is collecting timings, stage
+returns a shared do-nothing context, so the hooks cost next to nothing.
+"""
+
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class NullStage:
+    """Stand-in for Stage when nothing is recorded."""
+    output = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Metrics:
+    """Totals per stage: calls, seconds, bytes allocated, bytes output."""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.totals = defaultdict(lambda: [0, 0.0, 0, 0])
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __repr__(self):
+        """Printable representation."""
+        return "{} with {} stages".format(self.__class__, len(self.totals))
+
+    def record(self, name, seconds, allocated=0, output=0):
+        """Add a run of stage name to the totals, and to the request."""
+        if self.enabled:
+            with self.lock:
+                totals = self.totals[name]
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] += allocated
+                totals[3] += output
+        timings = getattr(self.local, 'timings', None)
+        if timings is not None:
+            timings.append((name, seconds))
+
+    def collect(self):
+        """Start collecting the timings of this thread, for one request."""
+        self.local.timings = []
+
+    def collected(self):
+        """Stop collecting, and return the timings of this thread."""
+        timings = getattr(self.local, 'timings', None) or []
+        self.local.timings = None
+        return timings
+
+    def prometheus(self, extra=None):
+        """The totals in the Prometheus text exposition format.
+
+        extra is a dict of more {name: (help, type, value)} to include.
+        Memory allocated is left out unless tracemalloc is tracing, as
+        zeros would read as nothing allocated.
+        """
+        series = [('dataobject_stage_calls_total', 'Number of runs of each stage', 0),
+                  ('dataobject_stage_seconds_total', 'Wall time spent in each stage', 1),
+                  ('dataobject_stage_allocated_bytes_total',
+                   'Net memory allocated by each stage, while tracemalloc is tracing', 2),
+                  ('dataobject_stage_output_bytes_total', 'Size of what each stage made', 3)]
+        if not tracemalloc.is_tracing():
+            del series[2]
+        with self.lock:
+            totals = {name: list(values) for name, values in self.totals.items()}
+        lines = []
+        for metric, description, i in series:
+            lines.append("# HELP {} {}".format(metric, description))
+            lines.append("# TYPE {} counter".format(metric))
+            for name in sorted(totals):
+                lines.append('{}{{stage="{}"}} {!r}'.format(metric, name, totals[name][i]))
+        for metric, (description, kind, value) in sorted((extra or {}).items()):
+            lines.append("# HELP {} {}".format(metric, description))
+            lines.append("# TYPE {} {}".format(metric, kind))
+            lines.append("{} {!r}".format(metric, value))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Stage:
+    """Context recording the time and memory of one run of a stage."""
+    def __init__(self, name):
+        self.name = name
+        self.output = 0
+
+    def __enter__(self):
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        allocated = 0
+        if self.tracing:
+            allocated = max(0, tracemalloc.get_traced_memory()[0] - self.memory)
+        metrics.record(self.name, seconds, allocated, self.output or 0)
+        return False
+
+
+def stage(name):
+    """Context for recording a stage, if anything is recording."""
+    if metrics.enabled or getattr(metrics.local, 'timings', None) is not None:
+        return Stage(name)
+    return NULL_STAGE
+
+
+def instrumented(name, chunks):
+    """Pass chunks through, recording the time taken and bytes made."""
+    if not metrics.enabled:
+        yield from chunks
+        return
+    seconds = 0
+    output = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        seconds += time.perf_counter() - start
+        output += len(chunk)
+        yield chunk
+        start = time.perf_counter()
+    seconds += time.perf_counter() - start
+    metrics.record(name, seconds, output=output)
@@ -0,0 +1,225 @@
+"""
+Background jobs for building data objects.
+
+Large objects are built in a bounded pool of worker processes instead
+of in the request thread. Submitting gives a job ID, which is used for
+polling the status, downloading the result, or cancelling the job.
+
+The very largest are built tiled and written to a file by the worker,
+so that they are never all in memory, nor sent between processes.
+Results which are paths to files are deleted along with their job.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from make_a_data_object.models import AdditiveDataObject
+from make_a_data_object.serializers import FORMATS
+from make_a_data_object.tiled import TILED_SIZE, tiled_data_object
+
+
+class QueueFull(Exception):
+    """Raised when there are already too many jobs waiting."""
+
+
+def render(params, directory=None):
+    """Build a data object and serialize it to bytes.
+
+    Objects of TILED_SIZE and up are built tiled instead, and written
+    to a new file in directory (default the temporary directory).
+
+    Parameters
+    ----------
+    params : dict
+        abstract, precipitation, daylength, size, base, border, limit,
+        alpha, format, precision, complement and tolerance
+    directory : string
+        Where to write the largest objects
+
+    Returns
+    -------
+    bytes or string
+        The serialized object, or the path to the file of it
+    """
+    if params['size'] >= TILED_SIZE:
+        data_object = tiled_data_object(
+            params['abstract'], params['precipitation'], params['daylength'],
+            size=params['size'], base=params['base'], border=params['border'],
+            limit=params['limit'], alpha=params['alpha'])
+        fd, filename = tempfile.mkstemp(suffix=FORMATS[params['format']].extension, dir=directory)
+        os.close(fd)
+        try:
+            data_object.write(filename, precision=params['precision'], fmt=params['format'],
+                              complement=params['complement'], tolerance=params['tolerance'])
+        except BaseException:
+            os.remove(filename)
+            raise
+        return filename
+    data_object = AdditiveDataObject(
+        params['abstract'], params['precipitation'], params['daylength'],
+        size=params['size'], base=params['base'], border=params['border'],
+        limit=params['limit'], alpha=params['alpha'])
+    chunks = data_object.serialize(params['format'], params['precision'],
+                                   params['complement'], params['tolerance'])
+    return b"".join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+
+
+class Job:
+    """A submitted job and what is known about it."""
+    def __init__(self, future, info):
+        self.id = uuid.uuid4().hex
+        self.future = future
+        self.info = info
+        self.submitted = time.monotonic()
+        self.finished = None
+        self.timed_out = False
+
+    def __repr__(self):
+        """Printable representation."""
+        return "{} {} {}".format(self.__class__, self.id, self.status())
+
+    def status(self):
+        """One of queued, running, done, failed, cancelled or timeout."""
+        if self.timed_out:
+            return 'timeout'
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+
+class JobQueue:
+    """Bounded pool of worker processes, with jobs tracked by ID."""
+    def __init__(self, workers=2, max_jobs=8, timeout=300, retention=600):
+        """The constructor.
+
+        Parameters
+        ----------
+        workers : int
+            Number of worker processes (default 2)
+        max_jobs : int
+            How many jobs can be queued or running at once (default 8)
+        timeout : float
+            Seconds after submission before a job is given up on
+            (default 300)
+        retention : float
+            Seconds to keep finished jobs around for download
+            (default 600)
+        """
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.retention = retention
+        self.pool = None
+        self.jobs = {}
+        # Reentrant, as submit counts the active jobs while holding it
+        self.lock = threading.RLock()
+
+    def __repr__(self):
+        """Printable representation."""
+        return "{} with {} jobs".format(self.__class__, len(self.jobs))
+
+    def active(self):
+        """Number of jobs queued or running.
+
+        Jobs which timed out while running are counted too, as they
+        still hold on to their worker until they finish.
+        """
+        with self.lock:
+            return sum(not job.future.done() for job in self.jobs.values())
+
+    def expire(self):
+        """Time out overdue jobs, and forget old finished ones."""
+        now = time.monotonic()
+        for job_id, job in list(self.jobs.items()):
+            if not job.future.done() and now - job.submitted > self.timeout:
+                # A running job cannot be stopped, but its result is dropped.
+                # It stays, and counts as active, until its worker is free
+                job.future.cancel()
+                job.timed_out = True
+            if job.future.done():
+                job.finished = job.finished or now
+                if now - job.finished > self.retention:
+                    del self.jobs[job_id]
+                    self.remove_file(job)
+
+    @staticmethod
+    def remove_file(job):
+        """Delete the file of a job whose result is a path to one."""
+        # Timed out jobs may have left a file too, once they finished
+        if (not job.future.cancelled() and job.future.exception() is None and
+                isinstance(job.future.result(), str)):
+            try:
+                os.remove(job.future.result())
+            except FileNotFoundError:
+                pass
+
+    def submit(self, function, *args, **info):
+        """Queue function(*args). info is kept with the job.
+
+        Returns
+        -------
+        Job
+            The job, with its ID
+
+        Raises
+        ------
+        QueueFull
+            If max_jobs are already queued or running
+        """
+        with self.lock:
+            self.expire()
+            if self.active() >= self.max_jobs:
+                raise QueueFull("{} jobs already queued or running".format(self.max_jobs))
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers)
+            try:
+                future = self.pool.submit(function, *args)
+            except BrokenProcessPool:
+                # A worker died, say killed for running out of memory, and
+                # took the pool with it. Its jobs have failed already
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = ProcessPoolExecutor(self.workers)
+                future = self.pool.submit(function, *args)
+            job = Job(future, info)
+            self.jobs[job.id] = job
+            return job
+
+    def get(self, job_id):
+        """The job with job_id, or None."""
+        with self.lock:
+            self.expire()
+            return self.jobs.get(job_id)
+
+    def result(self, job_id):
+        """Result of a finished job, or None if it is not done."""
+        job = self.get(job_id)
+        if job is None or job.status() != 'done':
+            return None
+        return job.future.result()
+
+    def cancel(self, job_id):
+        """Cancel a job which has not started yet.
+
+        Returns
+        -------
+        bool
+            Whether the job got cancelled
+        """
+        job = self.get(job_id)
+        return job is not None and job.future.cancel()
+
+    def error(self, job_id):
+        """The exception a failed job raised, or None."""
+        job = self.get(job_id)
+        if job is None or job.status() != 'failed':
+            return None
+        try:
+            return job.future.exception()
+        except CancelledError:
+            return None
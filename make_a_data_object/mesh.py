@@ -0,0 +1,341 @@
+"""
+Meshes of data object surfaces.
+
+A surface becomes a closed solid: the heightmap on top, walls down
+from its perimeter, and a flat bottom at z=0. The solid is what
+OpenSCAD surface() would produce, and it is built straight away with
+numpy, so the OpenSCAD stage can be skipped.
+"""
+
+import numpy as np
+
+STL_DTYPE = np.dtype([('normal', '<f4', (3,)),
+                      ('vertices', '<f4', (3, 3)),
+                      ('attribute', '<u2')])
+
+
+def perimeter(rows, cols):
+    """Grid indices around a rows * cols grid, counterclockwise from above."""
+    index = np.arange(rows * cols).reshape(rows, cols)
+    return np.concatenate((index[0, :],
+                           index[1:, -1],
+                           index[-1, -2::-1],
+                           index[-2:0:-1, 0]))
+
+
+def grid_faces(rows, cols):
+    """Two triangles for each cell of a rows * cols grid of vertices."""
+    index = np.arange(rows * cols).reshape(rows, cols)
+    a = index[:-1, :-1].ravel()
+    b = index[:-1, 1:].ravel()
+    c = index[1:, 1:].ravel()
+    d = index[1:, :-1].ravel()
+    return np.concatenate((np.stack((a, b, c), axis=1),
+                           np.stack((a, c, d), axis=1)))
+
+
+def close_solid(vertices, faces, rim):
+    """Close a top surface into a solid with walls and a bottom at z=0.
+
+    Parameters
+    ----------
+    vertices : np.array
+        (V, 3) array of vertex coordinates of the top surface
+    faces : np.array
+        (F, 3) array of vertex indices of the top surface triangles
+    rim : np.array
+        Vertex indices around the top surface, counterclockwise
+        seen from above
+
+    Returns
+    -------
+    tuple of np.array
+        Vertices and faces of the solid
+    """
+    first = len(vertices)
+    bottom = vertices[rim].copy()
+    bottom[:, 2] = 0
+    center = np.array([[bottom[:, 0].mean(), bottom[:, 1].mean(), 0]])
+    top0 = rim
+    top1 = np.roll(rim, -1)
+    bottom0 = first + np.arange(len(rim))
+    bottom1 = np.roll(bottom0, -1)
+    middle = np.full(len(rim), first + len(rim))
+    walls = np.concatenate((np.stack((top0, bottom0, bottom1), axis=1),
+                            np.stack((top0, bottom1, top1), axis=1)))
+    floor = np.stack((middle, bottom1, bottom0), axis=1)
+    return (np.concatenate((vertices, bottom, center)),
+            np.concatenate((faces, walls, floor)))
+
+
+def quadtree_leaves(surface, tolerance):
+    """Split the cells of a heightmap into square blocks, each of which
+    is flat enough to be drawn with a few triangles.
+
+    A block is kept whole if the heights inside it are within tolerance
+    of the bilinear patch through its corners, allowing for the twist of
+    the patch which the triangles cannot follow. Blocks are aligned to
+    powers of two, and the blocks of one size are tested all at once.
+
+    Returns
+    -------
+    tuple of np.array
+        Rows, columns and sizes of the blocks, in cells
+    """
+    rows, cols = surface.shape[0] - 1, surface.shape[1] - 1
+    covered = np.zeros((rows, cols), dtype=bool)
+    leaves = []
+    size = 2 ** int(np.log2(min(rows, cols)))
+    while size > 1:
+        na, nb = rows // size, cols // size
+        r = (np.arange(na) * size)[:, None] + np.arange(size + 1)
+        c = (np.arange(nb) * size)[:, None] + np.arange(size + 1)
+        block = surface[r[:, :, None, None], c[None, None, :, :]]
+        z00 = block[:, :1, :, :1]
+        z01 = block[:, :1, :, -1:]
+        z10 = block[:, -1:, :, :1]
+        z11 = block[:, -1:, :, -1:]
+        u = np.linspace(0, 1, size + 1)[None, :, None, None]
+        v = np.linspace(0, 1, size + 1)[None, None, None, :]
+        patch = (z00 * (1 - u) * (1 - v) + z01 * (1 - u) * v +
+                 z10 * u * (1 - v) + z11 * u * v)
+        error = (np.abs(block - patch).max(axis=(1, 3)) +
+                 np.abs(z00 - z01 - z10 + z11)[:, 0, :, 0] / 4)
+        taken = covered[:na * size, :nb * size].reshape(na, size, nb, size).any(axis=(1, 3))
+        a, b = np.nonzero((error <= tolerance) & ~taken)
+        accepted = np.zeros((na, nb), dtype=bool)
+        accepted[a, b] = True
+        covered[:na * size, :nb * size] |= accepted.repeat(size, axis=0).repeat(size, axis=1)
+        leaves.append((a * size, b * size, np.full(len(a), size)))
+        size //= 2
+    a, b = np.nonzero(~covered)
+    leaves.append((a, b, np.ones(len(a), dtype=int)))
+    return tuple(np.concatenate(leaf) for leaf in zip(*leaves))
+
+
+def decimated_faces(surface, tolerance):
+    """Triangles of a heightmap, merged in flat areas.
+
+    Each quadtree block is drawn as two triangles, unless a smaller
+    neighbour has a corner on one of its edges. Such a block is drawn
+    as a fan around a new center vertex instead, through all the
+    corners on its edges, so that the mesh has no T-junctions.
+
+    Returns
+    -------
+    tuple of np.array
+        (C, 3) center vertices, to be numbered after the grid vertices,
+        (F, 3) faces, and a boolean grid of the vertices in use
+    """
+    rows, cols = surface.shape
+    r0, c0, size = quadtree_leaves(surface, tolerance)
+    r1, c1 = r0 + size, c0 + size
+    active = np.zeros((rows, cols), dtype=bool)
+    active[r0, c0] = active[r0, c1] = active[r1, c0] = active[r1, c1] = True
+
+    index = np.arange(rows * cols).reshape(rows, cols)
+    along_rows = np.pad(np.cumsum(active, axis=1), ((0, 0), (1, 0)))
+    along_cols = np.pad(np.cumsum(active, axis=0), ((1, 0), (0, 0)))
+    extra = (along_rows[r0, c1] - along_rows[r0, c0 + 1] +
+             along_rows[r1, c1] - along_rows[r1, c0 + 1] +
+             along_cols[r1, c0] - along_cols[r0 + 1, c0] +
+             along_cols[r1, c1] - along_cols[r0 + 1, c1]) > 0
+
+    plain = ~extra
+    a, b, c, d = (index[r0, c0][plain], index[r0, c1][plain],
+                  index[r1, c1][plain], index[r1, c0][plain])
+    faces = [np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)]
+    centers = []
+    for i, (row0, col0, row1, col1) in enumerate(zip(r0[extra], c0[extra], r1[extra], c1[extra])):
+        ring = np.concatenate((
+            index[row0, col0:col1][active[row0, col0:col1]],
+            index[row0:row1, col1][active[row0:row1, col1]],
+            index[row1, col1:col0:-1][active[row1, col1:col0:-1]],
+            index[row1:row0:-1, col0][active[row1:row0:-1, col0]]))
+        middle = rows * cols + i
+        faces.append(np.stack((np.full(len(ring), middle), ring, np.roll(ring, -1)), axis=1))
+        corners = surface[[row0, row0, row1, row1], [col0, col1, col0, col1]]
+        centers.append(((col0 + col1) / 2, (row0 + row1) / 2, corners.mean()))
+    return np.array(centers).reshape(-1, 3), np.concatenate(faces), active
+
+
+def compact(vertices, faces):
+    """Drop the vertices that no face uses."""
+    used, faces = np.unique(faces, return_inverse=True)
+    return vertices[used], faces.reshape(-1, 3)
+
+
+def heightmap_mesh(surface, tolerance=None):
+    """Mesh of the solid under a heightmap.
+
+    The columns of the surface go along x and the rows along y, one
+    unit per cell, as in OpenSCAD surface().
+
+    Parameters
+    ----------
+    surface : np.array
+        2-D matrix of heights
+    tolerance : float
+        If given, decimate the mesh: merge cells wherever the heights
+        stay within tolerance of the merged triangles. 0 merges only
+        the exactly flat areas. None (default) keeps every cell
+
+    Returns
+    -------
+    tuple of np.array
+        (V, 3) float vertices and (F, 3) int faces, triangles wound
+        counterclockwise seen from the outside
+    """
+    surface = np.asarray(surface, dtype=np.float64)
+    rows, cols = surface.shape
+    y, x = np.mgrid[0:rows, 0:cols]
+    vertices = np.stack((x.ravel(), y.ravel(), surface.ravel()), axis=1).astype(np.float64)
+    rim = perimeter(rows, cols)
+    if tolerance is None:
+        return close_solid(vertices, grid_faces(rows, cols), rim)
+
+    centers, faces, active = decimated_faces(surface, tolerance)
+    return compact(*close_solid(np.concatenate((vertices, centers)), faces,
+                                rim[active.ravel()[rim]]))
+
+
+def face_normals(vertices, faces):
+    """Unit normals of the faces."""
+    triangles = vertices[faces]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0],
+                       triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def stl_header(faces):
+    """Header and face count of a binary STL file of faces triangles."""
+    return (b"binary STL from make_a_data_object".ljust(80, b" ") +
+            np.uint32(faces).astype('<u4').tobytes())
+
+
+def stl_records(vertices, faces):
+    """The faces as binary STL records."""
+    records = np.zeros(len(faces), dtype=STL_DTYPE)
+    records['normal'] = face_normals(vertices, faces)
+    records['vertices'] = vertices[faces]
+    return records.tobytes()
+
+
+def obj_vertices(vertices):
+    """Vertex lines of an OBJ file."""
+    return "".join("v {!r} {!r} {!r}\n".format(*vertex) for vertex in vertices.tolist()).encode()
+
+
+def obj_faces(faces):
+    """Face lines of an OBJ file, faces numbered from 0."""
+    return "".join("f {} {} {}\n".format(*face) for face in (faces + 1).tolist()).encode()
+
+
+def iter_stl(vertices, faces, block_faces=65536):
+    """Generate a binary STL file of a mesh."""
+    yield stl_header(len(faces))
+    for start in range(0, len(faces), block_faces):
+        yield stl_records(vertices, faces[start:start + block_faces])
+
+
+def iter_obj(vertices, faces, block_faces=65536):
+    """Generate a Wavefront OBJ file of a mesh."""
+    for start in range(0, len(vertices), block_faces):
+        yield obj_vertices(vertices[start:start + block_faces])
+    for start in range(0, len(faces), block_faces):
+        yield obj_faces(faces[start:start + block_faces])
+
+
+def grid_vertices(surface, start, stop):
+    """Vertices of rows start to stop of a heightmap, as in heightmap_mesh."""
+    block = np.asarray(surface[start:stop], dtype=np.float64)
+    y, x = np.mgrid[start:start + len(block), 0:block.shape[1]]
+    return np.stack((x.ravel(), y.ravel(), block.ravel()), axis=1).astype(np.float64)
+
+
+def closing_mesh(surface):
+    """Walls and floor under a heightmap, made from its perimeter alone.
+
+    Returns
+    -------
+    tuple of np.array
+        Vertices of the perimeter, the bottom and the center of the
+        floor, faces numbered among those vertices, and the grid
+        indices of the perimeter
+    """
+    rows, cols = surface.shape
+    rim = perimeter(rows, cols)
+    vertices = np.stack((rim % cols, rim // cols, np.asarray(surface).flat[rim]),
+                        axis=1).astype(np.float64)
+    return close_solid(vertices, np.empty((0, 3), dtype=int), np.arange(len(rim))) + (rim,)
+
+
+def iter_grid_faces(rows, cols, block_rows=64):
+    """The faces of grid_faces(rows, cols), in the same order, a band of
+    block_rows rows of cells at a time.
+
+    Yields
+    ------
+    tuple
+        First row of the band, and its faces numbered from the
+        first vertex of that row
+    """
+    for half in (0, 1):
+        for start in range(0, rows - 1, block_rows):
+            stop = min(rows - 1, start + block_rows)
+            faces = grid_faces(stop - start + 1, cols)
+            yield start, faces[len(faces) // 2:] if half else faces[:len(faces) // 2]
+
+
+def iter_heightmap_mesh(surface, block_rows=64):
+    """The mesh of heightmap_mesh(surface), a band of rows at a time.
+
+    The whole mesh of a large surface takes many times the memory of
+    the surface itself, while a band of it, and the walls and floor
+    made from the perimeter alone, stay small.
+
+    Yields
+    ------
+    tuple
+        The name of the part, 'vertices' or 'faces', and a block of
+        it, numbered as in heightmap_mesh
+    """
+    rows, cols = surface.shape
+    for start in range(0, rows, block_rows):
+        yield 'vertices', grid_vertices(surface, start, start + block_rows)
+    vertices, faces, rim = closing_mesh(surface)
+    yield 'vertices', vertices[len(rim):]
+    for start, block in iter_grid_faces(rows, cols, block_rows):
+        yield 'faces', block + start * cols
+    # The closing faces, from numbering the rim first to the whole grid
+    yield 'faces', np.concatenate((rim, rows * cols + np.arange(len(rim) + 1)))[faces]
+
+
+def iter_surface_stl(surface, tolerance=None, block_rows=64):
+    """Generate a binary STL file of the solid under a heightmap.
+
+    Unless it is decimated, the mesh is made a band of rows at a time.
+    """
+    if tolerance is not None:
+        yield from iter_stl(*heightmap_mesh(surface, tolerance))
+        return
+    rows, cols = surface.shape
+    vertices, faces, rim = closing_mesh(surface)
+    yield stl_header(2 * (rows - 1) * (cols - 1) + len(faces))
+    for start, band in iter_grid_faces(rows, cols, block_rows):
+        # The band, and the row of vertices under it
+        yield stl_records(grid_vertices(surface, start, start + block_rows + 1), band)
+    yield stl_records(vertices, faces)
+
+
+def iter_surface_obj(surface, tolerance=None, block_rows=64):
+    """Generate an OBJ file of the solid under a heightmap.
+
+    Unless it is decimated, the mesh is made a band of rows at a time.
+    """
+    if tolerance is not None:
+        yield from iter_obj(*heightmap_mesh(surface, tolerance))
+        return
+    for part, block in iter_heightmap_mesh(surface, block_rows):
+        yield obj_vertices(block) if part == 'vertices' else obj_faces(block)
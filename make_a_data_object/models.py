@@ -3,14 +3,14 @@ Models for MVC style Flask application.
 """
 
 import logging
-import csv
+import tempfile
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-import seaborn as sns
-from scipy.interpolate import interp1d, InterpolatedUnivariateSpline
-from scipy.ndimage.filters import gaussian_filter
-import requests
+from scipy.ndimage import gaussian_filter, gaussian_filter1d
+from make_a_data_object.daylength import DayLengthProvider
+from make_a_data_object.instrumentation import stage
+from make_a_data_object.resampling import resample
+from make_a_data_object.serializers import iter_text, write_text, serialize
+from make_a_data_object.vectorizers import vectorize
 
 # This needs to be conditioned. Flask provides logging via app.logger
 # logging.basicConfig(filename='debug.log', level=logging.DEBUG)
@@ -30,6 +30,10 @@ class DefaultParameters:
     smoothing = 5
     filename = 'dataobject.dat'
     limit = 20
+    size = 450
+    precision = None
+    format = 'dat'
+    tolerance = None
 
 
 class Weather:
@@ -59,11 +63,11 @@ class Weather:
 
 class Day:
     """A day."""
-    def __init__(self, lat=55.67, lng=12.56):
-        endpoint = 'https://api.sunrise-sunset.org/json'
-        callurl = endpoint + '?lat={}&lng={}'.format(lat, lng)
-        logger.debug('Getting data from {}'.format(callurl))
-        self.data = requests.get(callurl).json()['results']
+    provider = DayLengthProvider()
+
+    def __init__(self, lat=55.67, lng=12.56, provider=None):
+        provider = provider or self.provider
+        self.data = {'day_length': provider.day_length(lat, lng)}
 
     def length(self):
         """Length as a string."""
@@ -73,8 +77,12 @@ class Day:
 
 class DataObject:
     """A data object thing."""
+    # How the vectors are combined into the surface, see calculate_surface
+    combine = np.multiply
+
     def __init__(self, abstract, precipitation, daylength,
-                 size=450, base=50, border=25, limit=None, alpha=None):
+                 size=450, base=50, border=25, limit=None, alpha=None,
+                 method='separable', dtype=np.float64, encoding='wordlength'):
         """The constructor.
 
         Parameters
@@ -83,8 +91,8 @@ class DataObject:
             Abstract for the visit or presentation or something
         precipitation : list of numbers
             Precipitation data
-        daylength : int
-            Day length in hours
+        daylength : float or list of 7 floats
+            Day length in hours, or one for each day of the week
         size : int
             Size of the object, with equal in two dimensions (default 450)
         base : int
@@ -94,103 +102,194 @@ class DataObject:
         limit : int
             Limit the resolution of the object, the rest of the points
             are interpolated
-        alpha : int
+        alpha : int or float
             Amount of smoothing. Alpha parameter for gaussian blur
+        method : string
+            How to calculate the surface, 'separable' (default) or
+            'dense', see calculate_surface
+        dtype : np.dtype
+            Type of the surface, np.float32 to halve the memory
+            (default np.float64)
+        encoding : string
+            How the words of the abstract are encoded, one of
+            vectorizers.ENCODINGS (default 'wordlength')
         """
-        # Sanity checks for arguments. Type checking could be fun
-        assert isinstance(abstract, str)
-        assert isinstance(precipitation, list)
-        assert all(isinstance(p, (int, float)) for p in precipitation)
-        assert isinstance(size, int) and size > 1
-        assert isinstance(border, (type(None), int))  # and border >= 0
-        assert isinstance(limit, (type(None), int))  # and limit > 0
-        assert isinstance(alpha, (type(None), int))  # and alpha > 0
-        assert size - border * 2 > 0
+        self.check_arguments(abstract, precipitation, size, border, limit, alpha)
 
         self.size = size
         self.base = base
         self.border = border
-        # erm where did this constant come from again?
-        # self.zscale = self.size / 100
-        self.zscale = self.size / 25
-        self.data_size = self.size - 2 * self.border
-
-        # grid of coordinates
-        self.grid = np.mgrid[0:self.size, 0:self.size]
 
         # the actually interesting data
-        # numpy.interpolate takes list of new indices, list of old indices,
-        # and list of old values, to calculate new values
+        # resampled to data_size with cubic splines
         # Also do scaling for z. 2D inteprolation from scipy would be good
 
-        abstract_v = self.vectorize_abstract(abstract, limit=limit)
+        with stage('vectorize_abstract'):
+            abstract_v = self.vectorize_abstract(abstract, limit=limit, encoding=encoding)
+        with stage('interpolation'):
+            self.abstract = resample(abstract_v, self.data_size)
+        self.daylength = daylength
+        self.precipitation = self.signal(precipitation, daylength)
 
-        # Intepolation function for vectorized abstract
-        self.ai = interp1d(
-            np.linspace(0, self.data_size, len(abstract_v)),
-            abstract_v, kind='cubic')
-        self.abstract = self.ai(range(self.data_size))
+        # the surface, scaled and clipped in place
+        with stage('calculate_surface') as s:
+            self.surface = np.empty((self.size, self.size), dtype=dtype)
+            self.calculate_surface(self.border, self.abstract, self.precipitation,
+                                   alpha=alpha, method=method, out=self.surface)
+            s.output = self.surface.nbytes
+        self.scale_and_clip(self.surface)
 
-        # Intepolation function for precipitation
-        self.pi = interp1d(
-            np.linspace(0, self.data_size, len(precipitation)),
-            precipitation, kind='cubic')
-        self.precipitation = self.pi(range(self.data_size))
+        logger.debug(self.surface)
+
+    @staticmethod
+    def check_arguments(abstract, precipitation, size, border, limit, alpha):
+        """Sanity checks for arguments. Type checking could be fun."""
+        assert isinstance(abstract, str)
+        assert isinstance(precipitation, list)
+        assert all(isinstance(p, (int, float)) for p in precipitation)
+        assert isinstance(size, int) and size > 1
+        assert isinstance(border, (type(None), int))  # and border >= 0
+        assert isinstance(limit, (type(None), int))  # and limit > 0
+        assert isinstance(alpha, (type(None), int, float))  # and alpha > 0
+        assert size - border * 2 > 0
+
+    @property
+    def zscale(self):
+        """Scale of the heights."""
+        # erm where did this constant come from again?
+        # return self.size / 100
+        return self.size / 25
+
+    @property
+    def data_size(self):
+        """Size of the object inside the border."""
+        return self.size - 2 * self.border
+
+    def signal(self, precipitation, daylength):
+        """Precipitation resampled to data_size, with the sun added."""
+        with stage('interpolation'):
+            signal = resample(precipitation, self.data_size)
         # Let's add a constant 1 to the precipitation to bring it up from 0
-        self.precipitation = list(np.add(self.precipitation, 1))
+        signal += 1
 
         # Let's add sun to the precipitation
-        # self.precipitation = list(np.add(self.precipitation, sun))
-        # way sketchy here...
-        self.daylength = daylength
-        sun_for_a_day = list(map(lambda t: self.sun(t, self.daylength), np.linspace(0, 24, num=int(len(self.precipitation) / 7))))
-        # Pad to length of the precipitation after possible rounding artefacts
-        sun_for_a_week = sun_for_a_day * 7 + [0] * (len(self.precipitation) - len(sun_for_a_day * 7))
-
-        self.precipitation = np.add(
-            self.precipitation,
-            list(map(lambda t: self.sun(t, self.daylength), sun_for_a_week)))
-
-        # the surface
-        self.surface = self.base + self.calculate_surface(self.border,
-                                                          self.abstract,
-                                                          self.precipitation,
-                                                          alpha=alpha) * self.zscale
-        # Clip it. Crude. Refactor this
-        self.surface = np.clip(self.surface, self.base, self.size - self.base)
+        with stage('sun'):
+            signal += self.daylight_profile(len(signal), daylength)
+        return signal
 
-        logger.debug(self.surface)
+    def scale_and_clip(self, surface):
+        """Scale the heights of a calculated surface, in place, and
+        clip them between base and size - base.
+        """
+        with stage('clipping'):
+            surface *= self.zscale
+            surface += self.base
+            # Clip it. Crude. Refactor this
+            np.clip(surface, self.base, self.size - self.base, out=surface)
+        return surface
 
     def __repr__(self):
         """Printable representation."""
         return "{} with a {} surface".format(self.__class__, self.surface.shape)
 
+    @classmethod
+    def preview(cls, abstract, precipitation, daylength, size=64, full_size=450,
+                base=50, border=25, limit=None, alpha=None):
+        """A low resolution version of the object, fast enough to
+        rebuild on every keystroke.
+
+        base, border and alpha are given for the full size object, and
+        scaled down to size, so that the preview looks like a shrunk
+        copy of it. Heights are scaled down as well.
+        """
+        scale = size / full_size
+        return cls(abstract, precipitation, daylength, size=size, base=base * scale,
+                   border=max(1, round(border * scale)) if border else border,
+                   limit=limit, alpha=alpha * scale if alpha else alpha, dtype=np.float32)
+
+    @property
+    def grid(self):
+        """Grid of coordinates, made when needed as it is only for plotting."""
+        return np.mgrid[0:self.size, 0:self.size]
+
     def __str__(self):
         """String representation."""
-        # there is also np.array2string
-        return "\n".join(" ".join(str(float(y)) for y in row) for row in self.surface)
+        return "".join(self.iter_text())
 
-    def vectorize_abstract(self, abstract, limit=None):
-        """Construct a vector representation of the abstract, up to limit."""
-        lens = list(map(len, abstract.split()[:limit]))
-        # av = np.array([10 + (lens[i - 1] - l) for (i, l) in enumerate(lens)])
-        av = np.array([np.abs(lens[i - 1] - l) for (i, l) in enumerate(lens)])
-        return av
+    def iter_text(self, precision=None):
+        """Generate the string representation in chunks of rows."""
+        return iter_text(self.surface, precision=precision)
 
-    def sun(self, t, dayhours):
+    def serialize(self, fmt='dat', precision=None, complement=False, tolerance=None):
+        """Generate the surface, or its complement, in one of the
+        serializers.FORMATS. Meshes are decimated if a height
+        tolerance is given.
+        """
+        if complement:
+            with stage('get_complement'):
+                surface = self.get_complement()
+        else:
+            surface = self.surface
+        return serialize(surface, fmt, precision=precision, zmax=self.size,
+                         tolerance=tolerance)
+
+    @staticmethod
+    def vectorize_abstract(abstract, limit=None, encoding='wordlength'):
+        """Construct a vector representation of the abstract, up to limit.
+
+        By default the differences of the lengths of neighbouring words,
+        see vectorizers.vectorize for the others.
+        """
+        return vectorize(abstract, limit=limit, encoding=encoding)
+
+    @staticmethod
+    def sun(t, dayhours):
         """This returns -1 to 1, how high up in the sky is the sun.
         Not really accurate as sun reaches the same peak throughout
         the year.
+
+        Works on numbers and arrays alike. With no day (0 hours) it is
+        night all day, and with no night (24 hours) day all day.
         """
+        t = np.asarray(t, dtype=float)
+        dayhours = np.asarray(dayhours, dtype=float)
         # assert t >= 0
-        assert t <= 24
-        assert dayhours >= 0
-        assert dayhours <= 24
-        if t < dayhours:
-            # return np.sin(np.pi / (dayhours / t))
-            return np.sin(np.pi * t / dayhours)
-        else:
-            return -np.sin(np.pi * (24-t) / (24-dayhours))
+        assert np.all(t <= 24)
+        assert np.all(dayhours >= 0)
+        assert np.all(dayhours <= 24)
+        # Dividing by one instead of zero where the value is not used
+        day = np.sin(np.pi * t / np.where(dayhours > 0, dayhours, 1))
+        night = -np.sin(np.pi * (24 - t) / np.where(dayhours < 24, 24 - dayhours, 1))
+        return np.where((t < dayhours) & (dayhours > 0), day, night)
+
+    def daylight_profile(self, n, daylength):
+        """The sun over a week, sampled at n points.
+
+        Each day gets n // 7 points of sun, and the rest at the end are
+        padded with zeros. The sun is then taken of that, once more.
+
+        Parameters
+        ----------
+        n : int
+            Number of points
+        daylength : float or list of 7 floats
+            Day length in hours, the same for the whole week or one
+            for each day
+
+        Returns
+        -------
+        np.array
+            The sun at the n points
+        """
+        per_day = n // 7
+        dayhours = np.broadcast_to(np.asarray(daylength, dtype=float), (7,))
+        t = np.linspace(0, 24, num=per_day)
+        week = np.zeros(n)
+        week[:7 * per_day] = self.sun(t, dayhours[:, np.newaxis]).ravel()
+        # Pad to length n after possible rounding artefacts
+        dayhours = np.concatenate((np.repeat(dayhours, per_day),
+                                   np.full(n - 7 * per_day, dayhours[-1])))
+        return self.sun(week, dayhours)
 
     def outerprod_surface(self, xd, yd):
         """Yet another function. Outputs size * size shaped np.ndarray."""
@@ -198,12 +297,73 @@ class DataObject:
         # return np.outer((yd + 0.1), xd) / np.outer(xd, (yd + 0.1))
         return np.outer(xd, yd)
 
-    def calculate_surface(self, border, xd, yd, alpha=0):
+    @staticmethod
+    def smooth(v, alpha):
+        """Gaussian blur of a vector, or of each row of a matrix of them,
+        or the vector itself if alpha is 0.
+        """
+        return gaussian_filter1d(v, alpha, axis=-1) if alpha else np.asarray(v, dtype=float)
+
+    @classmethod
+    def outer_surface(cls, xd, yd, alpha=0, method='separable', out=None):
+        """The vectors xd and yd combined into a matrix, blurred.
+
+        Given matrices of vectors, a row each, makes a stack of such
+        matrices, each blurred on its own.
+
+        Parameters
+        ----------
+        xd, yd : np.array
+            Vectors for the first and second edge of the matrix
+        alpha, method, out
+            As for calculate_surface
+
+        Returns
+        -------
+        np.array
+            combine(xd[..., :, np.newaxis], yd[..., np.newaxis, :]), blurred
+        """
+        alpha = alpha or 0
+        if method == 'separable':
+            # In the type of out already, or numpy makes a temporary matrix
+            dtype = out.dtype if out is not None else float
+            return cls.combine(cls.smooth(xd, alpha).astype(dtype)[..., :, np.newaxis],
+                               cls.smooth(yd, alpha).astype(dtype)[..., np.newaxis, :], out=out)
+        elif method == 'dense':
+            # Blurring across a stack would mix the matrices together
+            sigma = (0,) * (np.ndim(xd) - 1) + (alpha, alpha)
+            return gaussian_filter(cls.combine(np.asarray(xd)[..., :, np.newaxis],
+                                               np.asarray(yd)[..., np.newaxis, :]), sigma, output=out)
+        raise ValueError("unknown method {}, expected 'separable' or 'dense'".format(method))
+
+    @staticmethod
+    def zero_border(surface, border, start=0, size=None):
+        """Pull the border of a surface, or of a stack of them, to zero
+        in place.
+
+        With start and size, surface is the block of rows from start
+        of a surface with size rows.
+        """
+        if border:
+            size = size or surface.shape[-2]
+            surface[..., :max(0, border - start), :] = 0
+            surface[..., max(0, size - border - start):, :] = 0
+            surface[..., :border] = 0
+            surface[..., -border:] = 0
+        return surface
+
+    def calculate_surface(self, border, xd, yd, alpha=0, method='separable', out=None):
         """Calculate a surface.
 
         Return a surface, which conceptually matches
         the surface function in OpenSCAD
 
+        The surface is xd and yd combined, by default their outer
+        product, blurred. Blurring the outer product is the same as
+        taking the outer product of the blurred vectors, which is what
+        the 'separable' method does, without ever blurring the whole
+        matrix. The same goes for the outer sum.
+
         Parameters
         ----------
         border : int
@@ -214,40 +374,40 @@ class DataObject:
             Numpy array of data for the second of the matrix
         alpha : int
             Amount of smoothing, alpha parameter for Gaussian blurr
+        method : string
+            'separable' (default) blurs the vectors, 'dense' the matrix
+        out : np.array
+            Where to put the surface, instead of a new array
 
         Returns
         -------
         np.array
             2-D matrix, size len(xd) + 2*border on each side
         """
-        alpha = alpha or 0
         assert len(xd) == len(yd), "both vectors (yd={}, xd={}) must be same size".format(len(xd), len(yd))
         # Pad xd and yd with the border, and construct the matrix
-        # using nympy.pad would be wise
-        surface = gaussian_filter(
-            np.outer(
-                np.concatenate((np.zeros(border), xd, np.zeros(border))),
-                np.concatenate((np.zeros(border), yd, np.zeros(border)))),
-            alpha)
+        xd = np.pad(np.asarray(xd, dtype=float), border)
+        yd = np.pad(np.asarray(yd, dtype=float), border)
+        surface = self.outer_surface(xd, yd, alpha, method, out=out)
         # Smoothing overflows onto the border. Compensate by pulling it to zero
-        if border:
-            surface[0:border, :] = 0
-            surface[-border:, :] = 0
-            surface[:, 0:border] = 0
-            surface[:, -border:] = 0
-
-        return surface
+        return self.zero_border(surface, border)
 
     def plot_heatmap(self, **kwargs):
         """Plot a heatmap of the surface for preview."""
+        # Plotting libraries are imported only when plotting, they are
+        # slow to import and not needed by the web app
+        import seaborn as sns
         return sns.heatmap(self.surface, square=True, **kwargs)
 
     def plot_contourf(self, **kwargs):
         """Plot a filled contour of the surface for preview."""
+        import matplotlib.pyplot as plt
         return plt.contourf(self.surface, **kwargs)
 
     def plot_surface(self, **kwargs):
         """Plot the surface for preview."""
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d import Axes3D  # noqa: F401, registers the 3d projection
         if 'ax' not in kwargs:
             fig, ax = plt.subplots(subplot_kw={'projection': '3d'}, **kwargs)
         else:
@@ -259,74 +419,53 @@ class DataObject:
         ax.set_ylabel('precipitation')
         return ax.plot_surface(self.grid[0], self.grid[1], self.surface)
 
-    def get_complement(self):
-        """Calculate the complement object to store in ETHOS Lab."""
-        complement = self.size - self.surface
+    def get_complement(self, out=None, block_rows=256):
+        """Calculate the complement object to store in ETHOS Lab.
+
+        It is made block_rows rows at a time into out, if given. The
+        complement of a memory-mapped surface goes to a temporary
+        memory-mapped file by default, so that it is never all in memory.
+        """
+        if out is None and isinstance(self.surface, np.memmap):
+            with tempfile.TemporaryFile() as fd:
+                out = np.memmap(fd, dtype=self.surface.dtype, mode='w+',
+                                shape=self.surface.shape)
+        elif out is None:
+            out = np.empty(self.surface.shape, dtype=self.surface.dtype)
+        complement = out
+        for start in range(0, self.size, block_rows):
+            # Flipped left to right on the way, the border is symmetric anyway
+            np.subtract(self.size, self.surface[start:start + block_rows, ::-1],
+                        out=complement[start:start + block_rows])
         complement[0:self.border, :] = self.base
         complement[-self.border:, :] = self.base
         complement[:, 0:self.border] = self.base
         complement[:, -self.border:] = self.base
 
-        return np.fliplr(complement)
+        return complement
 
-    def write(self, filename):
-        """Write to file filename."""
-        with open(filename, "w") as fd:
-            writer = csv.writer(fd, delimiter=" ")
-            # fd.write(filename + "\n")
-            for row in self.surface:
-                # print(row)
-                writer.writerow(row)
+    def write(self, filename, precision=None, fmt='dat', complement=False, tolerance=None):
+        """Write to file filename, as text unless another fmt is given."""
+        if fmt == 'dat':
+            with open(filename, "w") as fd:
+                write_text(self.get_complement() if complement else self.surface,
+                           fd, precision=precision)
+        else:
+            with open(filename, "wb") as fd:
+                for chunk in self.serialize(fmt, precision=precision, complement=complement,
+                                            tolerance=tolerance):
+                    fd.write(chunk)
 
 
 class AdditiveDataObject(DataObject):
     """A Data object which has an additive surface, ie. less pronounced
     variation in z.
     """
+    combine = np.add
+
     def __init__(self, abstract, precipitation, daylength,
-                 size=450, base=50, border=25, limit=None, alpha=None):
+                 size=450, base=50, border=25, limit=None, alpha=None,
+                 method='separable', dtype=np.float64, encoding='wordlength'):
         """The constructor."""
         super().__init__(abstract, precipitation, daylength,
-                         size, base, border, limit, alpha)
-
-    def calculate_surface(self, border, xd, yd, alpha=0):
-        """Calculate a surface.
-
-        Return a surface, which conceptually matches
-        the surface function in OpenSCAD
-
-        Parameters
-        ----------
-        border : int
-            Border width, which is applied to all sides
-        xd : np.array
-            Numpy array of data for first edge of the matrix
-        yd : np.array
-            Numpy array of data for the second of the matrix
-        alpha : int
-            Amount of smoothing, alpha parameter for Gaussian blurr
-
-        Returns
-        -------
-        np.array
-            2-D matrix, size len(xd) + 2*border on each side
-        """
-
-        alpha = alpha or 0
-        assert len(xd) == len(yd), "both vectors (yd={}, xd={}) must be same size".format(len(xd), len(yd))
-        # Pad xd and yd with the border, and construct the matrix
-        # using nympy.pad would be wise
-        surface = gaussian_filter(
-            np.add(
-                np.concatenate((np.zeros(border), xd, np.zeros(border))).reshape(self.size, 1),
-                np.concatenate((np.zeros(border), yd, np.zeros(border)))),
-            alpha)
-
-        # Smoothing overflows onto the border. Compensate by pulling it to zero
-        if border:
-            surface[0:border, :] = 0
-            surface[-border:, :] = 0
-            surface[:, 0:border] = 0
-            surface[:, -border:] = 0
-
-        return surface
+                         size, base, border, limit, alpha, method, dtype, encoding)
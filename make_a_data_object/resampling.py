@@ -0,0 +1,70 @@
+"""
+Cubic resampling of the abstract and precipitation vectors.
+
+A cubic spline through n evenly spaced points is linear in the values,
+so evaluating it at data_size points is a (data_size, n) matrix times
+the values. The matrix only depends on n and data_size, and is cached,
+so resampling is a single matrix product, and resampling many vectors
+of the same length at once is a single matrix-matrix product.
+
+The matrix is n times bigger than the spline, though, so it is only
+made for short vectors like the precipitation and a limited abstract.
+Longer ones, like a whole paper pasted in, are fitted directly.
+"""
+
+from functools import lru_cache
+import numpy as np
+
+# Longest vectors resampled with a cached matrix
+MAX_PLAN_SIZE = 64
+
+
+def check_size(n):
+    """Raise ValueError if n values are too few for a cubic spline."""
+    if n == 0:
+        raise ValueError("cannot resample an array of size 0")
+    if n < 4:
+        raise ValueError("resampling needs at least 2 entries, and at least 4 for "
+                         "a cubic spline, got {}".format(n))
+
+
+@lru_cache(maxsize=64)
+def cubic_plan(n, data_size):
+    """Matrix evaluating the cubic spline through n points at data_size points.
+
+    The n points are spread evenly over 0 to data_size, and the spline
+    is evaluated at 0, 1, ..., data_size - 1, with not-a-knot end
+    conditions, as interp1d(kind='cubic') does.
+    """
+    # Imported here, as it is slow to import and only needed per new plan
+    from scipy.interpolate import make_interp_spline
+    check_size(n)
+    spline = make_interp_spline(np.linspace(0, data_size, n), np.eye(n), k=3)
+    plan = spline(np.arange(data_size))
+    plan.setflags(write=False)
+    return plan
+
+
+def resample(values, data_size):
+    """Resample values to data_size points with a cubic spline.
+
+    Parameters
+    ----------
+    values : np.array
+        Vector of n values, or (n, N) matrix of N vectors to resample
+        all at once
+    data_size : int
+        Number of points to resample to
+
+    Returns
+    -------
+    np.array
+        Vector of data_size values, or (data_size, N) matrix
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) <= MAX_PLAN_SIZE:
+        return cubic_plan(len(values), data_size) @ values
+    from scipy.interpolate import make_interp_spline
+    check_size(len(values))
+    spline = make_interp_spline(np.linspace(0, data_size, len(values)), values, k=3)
+    return spline(np.arange(data_size))
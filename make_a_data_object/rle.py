@@ -0,0 +1,70 @@
+"""
+Run-length encoded surface text.
+
+The flat border, and the areas clipped to base, are long runs of the
+same height. In the run-length encoded text a run is written once as
+count*height, and everything else is as in the OpenSCAD surface() text:
+
+    50 50 50 50 50 50 50 61.2 61.9 50 50 50  ->  7*50 61.2 61.9 3*50
+
+OpenSCAD does not read it, so it is decoded back to .dat before use:
+
+    python -m make_a_data_object.rle dataobject.rle > dataobject.dat
+"""
+
+import argparse
+import sys
+import numpy as np
+
+
+def _format_row(row, precision=None):
+    """Format a row of heights with runs of equal heights as count*height."""
+    starts = np.flatnonzero(np.concatenate(([True], row[1:] != row[:-1])))
+    counts = np.diff(np.append(starts, len(row)))
+    fmt = repr if precision is None else "%.{}f".format(precision).__mod__
+    return " ".join(fmt(value) if count == 1 else "{}*{}".format(count, fmt(value))
+                    for value, count in zip(row[starts].tolist(), counts.tolist()))
+
+
+def iter_rle(surface, precision=None, block_rows=64):
+    """Generate the run-length encoded text of a surface, encoded.
+
+    With precision, heights are rounded to that many decimals before
+    looking for runs, so heights which would be written the same make
+    one run.
+    """
+    surface = np.asarray(surface)
+    for start in range(0, surface.shape[0], block_rows):
+        block = surface[start:start + block_rows]
+        if precision is not None:
+            block = np.round(block, precision)
+        chunk = "\n".join(_format_row(row, precision) for row in block)
+        yield (chunk if start == 0 else "\n" + chunk).encode()
+    yield b"\n"
+
+
+def iter_decode(lines):
+    """Decode run-length encoded lines into lines of surface() text."""
+    for line in lines:
+        heights = []
+        for token in line.split():
+            count, run, height = token.rpartition('*')
+            heights.extend([height] * int(count) if run else [height])
+        if heights:
+            yield " ".join(heights) + "\n"
+
+
+def main(argv=None):
+    """Command line entry point, decoding a file to standard output."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rle', help='run-length encoded file, - for standard input')
+    args = parser.parse_args(argv)
+
+    with (sys.stdin if args.rle == '-' else open(args.rle)) as fd:
+        sys.stdout.writelines(iter_decode(fd))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
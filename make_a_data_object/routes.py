@@ -1,9 +1,52 @@
 """
 Routes for MVC style traffic control in Flask.
 """
-from flask import Response, render_template, request
+import os
+import tracemalloc
+from flask import Response, abort, g, jsonify, render_template, request, send_file, url_for
 from make_a_data_object import app
+from make_a_data_object.cache import ResultCache
+from make_a_data_object.daylength import DayLengthProvider
+from make_a_data_object.instrumentation import instrumented, metrics, stage
+from make_a_data_object.jobs import JobQueue, QueueFull, render
 from make_a_data_object.models import AdditiveDataObject, DefaultParameters, Day
+from make_a_data_object.serializers import FORMATS, format_for_mimetype
+from make_a_data_object.tiled import TILED_SIZE
+
+result_cache = ResultCache(app.config['RESULT_CACHE_BYTES'], app.config['RESULT_CACHE_DIR'],
+                           app.config['RESULT_CACHE_DISK_BYTES'])
+day_lengths = DayLengthProvider(app.config['SUNRISE_SUNSET_ENDPOINT'],
+                                timeout=app.config['SUNRISE_SUNSET_TIMEOUT'])
+job_queue = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_QUEUE_SIZE'],
+                     app.config['JOB_TIMEOUT'])
+metrics.enabled = app.config['METRICS_ENABLED']
+if app.config['METRICS_TRACE_MEMORY'] and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+@app.before_request
+def start_timing():
+    """Collect stage timings for the Server-Timing header, if asked for."""
+    g.timing = bool(app.config['SERVER_TIMING'] or request.args.get('timing') or
+                    request.headers.get('X-Server-Timing'))
+    if g.timing:
+        metrics.collect()
+
+
+@app.after_request
+def add_server_timing(response):
+    """Add the collected stage timings as a Server-Timing header."""
+    if g.get('timing'):
+        response.headers['Server-Timing'] = ", ".join(
+            "{};dur={:.3f}".format(name, seconds * 1000) for name, seconds in metrics.collected())
+    return response
+
+
+@app.teardown_request
+def stop_timing(exc):
+    """Stop collecting stage timings, even if the request failed."""
+    if g.get('timing'):
+        metrics.collected()
 
 
 @app.route('/hello')
@@ -15,11 +58,15 @@ def hello_world():
 @app.route('/')
 def index():
     """Index route."""
+    with stage('day_length'):
+        daylength_today = Day(provider=day_lengths).length()
     return render_template('index.html',
-                           daylength_today=Day().length(),
+                           daylength_today=daylength_today,
                            default_limit=DefaultParameters.limit,
                            default_smoothing=DefaultParameters.smoothing,
-                           default_filename=DefaultParameters.filename)
+                           default_filename=DefaultParameters.filename,
+                           default_format=DefaultParameters.format,
+                           formats=FORMATS)
 
 
 @app.route('/make', methods=['POST'])
@@ -38,9 +85,160 @@ def submit():
     except ValueError:
         limit = DefaultParameters.limit
 
+    try:
+        precision = int(request.form.get('precision'))
+    except (TypeError, ValueError):
+        precision = DefaultParameters.precision
+    # Checked now, the formatting only fails once the download is streaming
+    if precision is not None and not 0 <= precision <= 17:
+        abort(400, "Precision must be from 0 to 17 decimals")
+
+    fmt = request.values.get('format') or format_for_mimetype(
+        request.accept_mimetypes.best_match(
+            [serializer.mimetype for serializer in FORMATS.values()])) or DefaultParameters.format
+    if fmt not in FORMATS:
+        abort(400, "Unknown format {}".format(fmt))
+
+    complement = request.values.get('complement', '').strip().lower() in ('1', 'true', 'on', 'yes')
+
+    try:
+        tolerance = float(request.values.get('tolerance'))
+    except (TypeError, ValueError):
+        tolerance = DefaultParameters.tolerance
+
+    try:
+        size = int(request.form.get('size'))
+    except (TypeError, ValueError):
+        size = DefaultParameters.size
+    # Larger than the border on both sides, and small enough to fit on disk
+    if not 2 * 25 < size <= app.config['MAX_SIZE']:
+        abort(400, "Size must be from {} to {}".format(2 * 25 + 1, app.config['MAX_SIZE']))
+    # Decimating takes the whole mesh at once, which the largest sizes do not fit
+    if tolerance is not None and 'tolerance' in FORMATS[fmt].options and size >= TILED_SIZE:
+        abort(400, "Meshes of size {} and up cannot be decimated".format(TILED_SIZE))
+
     filename = request.form.get('filename') or DefaultParameters.filename
+    if fmt != DefaultParameters.format:
+        filename = os.path.splitext(filename)[0] + FORMATS[fmt].extension
+
+    app.logger.debug("Parsed input abstract:{}, precip:{}, daylength: {}, smoothing:{}, limit:{}, size:{}, format:{}, complement:{}, tolerance:{}, filename:{}".format(abstract, precip, daylength, smoothing, limit, size, fmt, complement, tolerance, filename))
+    params = {'abstract': abstract, 'precipitation': precip, 'daylength': daylength,
+              'size': size, 'base': 50, 'border': 25, 'limit': limit, 'alpha': smoothing,
+              'format': fmt, 'precision': precision, 'complement': complement,
+              'tolerance': tolerance}
+    headers = {"content-disposition": "attachment;filename={}".format(filename)}
+    key = ResultCache.key(kind=AdditiveDataObject.__name__,
+                          abstract=AdditiveDataObject.vectorize_abstract(abstract, limit),
+                          **{name: value for name, value in params.items()
+                             if name not in ('abstract', 'limit')})
+    cached = result_cache.get(key)
+    if cached is not None:
+        return Response(cached, mimetype=FORMATS[fmt].mimetype, headers=headers)
+
+    if request.values.get('mode') == 'async' or size > app.config['ASYNC_SIZE_THRESHOLD']:
+        try:
+            job = job_queue.submit(render, params, app.config['JOB_RESULT_DIR'],
+                                   format=fmt, filename=filename, key=key)
+        except QueueFull as e:
+            return jsonify(error=str(e)), 429, {'Retry-After': '10'}
+        return jsonify(describe_job(job)), 202, {'Location': url_for('job_status', job_id=job.id)}
+
+    with stage('build'):
+        data_object = AdditiveDataObject(abstract, precip, daylength,
+                                         size=size, base=50, border=25, limit=limit, alpha=smoothing)
+    chunks = instrumented('serialize_{}'.format(fmt),
+                          data_object.serialize(fmt, precision, complement, tolerance))
+    return Response(result_cache.tee(key, chunks), mimetype=FORMATS[fmt].mimetype, headers=headers)
+
+
+@app.route('/preview', methods=['POST'])
+def preview():
+    """Route for a low resolution preview of the object in the form.
+
+    Returns a PNG heightmap, or with ?format=json the heights rounded to
+    one decimal. Half filled forms are expected while typing, so any
+    input which cannot make an object yet is a 400, not an error.
+    """
+    fmt = request.args.get('format') or 'png'
+    if fmt not in ('png', 'json'):
+        abort(400, "Unknown preview format {}, expected png or json".format(fmt))
+    try:
+        abstract = request.form['abstract']
+        precip = [float(p) for p in request.form['precipitation'].split(',')]
+        daylength = float(request.form['daylength'].replace(':', '.'))
+        smoothing = int(request.form.get('smoothing') or DefaultParameters.smoothing)
+        limit = int(request.form.get('limit') or DefaultParameters.limit)
+        with stage('preview'):
+            data_object = AdditiveDataObject.preview(
+                abstract, precip, daylength, size=app.config['PREVIEW_SIZE'],
+                full_size=DefaultParameters.size, base=50, border=25, limit=limit, alpha=smoothing)
+    except (KeyError, ValueError, AssertionError) as e:
+        abort(400, "Cannot preview yet: {}".format(e))
+
+    if fmt == 'json':
+        return jsonify(size=data_object.size, zmax=data_object.size,
+                       heights=data_object.surface.astype(float).round(1).tolist())
+    return Response(b"".join(data_object.serialize('png')), mimetype=FORMATS['png'].mimetype)
+
+
+def describe_job(job):
+    """Status of a job, with links to poll it and to get the result."""
+    status = {'id': job.id,
+              'status': job.status(),
+              'status_url': url_for('job_status', job_id=job.id),
+              'result_url': url_for('job_result', job_id=job.id)}
+    error = job_queue.error(job.id)
+    if error is not None:
+        status['error'] = "{}: {}".format(error.__class__.__name__, error)
+    return status
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Route for polling a job."""
+    job = job_queue.get(job_id) or abort(404)
+    return jsonify(describe_job(job))
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def job_cancel(job_id):
+    """Route for cancelling a job which has not started yet."""
+    job = job_queue.get(job_id) or abort(404)
+    if not job_queue.cancel(job_id):
+        return jsonify(describe_job(job)), 409
+    return jsonify(describe_job(job))
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Route for downloading the result of a finished job."""
+    job = job_queue.get(job_id) or abort(404)
+    data = job_queue.result(job_id)
+    if data is None:
+        return jsonify(describe_job(job)), 409
+    if isinstance(data, str):
+        # The largest objects are left in a file by the worker
+        return send_file(data, mimetype=FORMATS[job.info['format']].mimetype,
+                         as_attachment=True, download_name=job.info['filename'])
+    result_cache.put(job.info['key'], data)
+    return Response(data, mimetype=FORMATS[job.info['format']].mimetype,
+                    headers={"content-disposition": "attachment;filename={}".format(job.info['filename'])})
+
+
+@app.route('/cache')
+def cache_stats():
+    """Hit and miss counters of the result cache."""
+    return jsonify(result_cache.stats())
+
 
-    app.logger.debug("Parsed input abstract:{}, precip:{}, daylength: {}, smoothing:{}, limit:{}, filename:{}".format(abstract, precip, daylength, smoothing, limit, filename))
-    data_object = AdditiveDataObject(abstract, precip, daylength,
-                                     size=450, limit=limit, alpha=smoothing)
-    return Response(str(data_object), mimetype='text/plain', headers={"content-disposition": "attachment;filename={}".format(filename)})
+@app.route('/metrics')
+def metrics_route():
+    """Stage timings and other counters, for Prometheus to scrape."""
+    cache = result_cache.stats()
+    extra = {
+        'dataobject_result_cache_hits_total': ('Result cache hits', 'counter', cache['hits']),
+        'dataobject_result_cache_misses_total': ('Result cache misses', 'counter', cache['misses']),
+        'dataobject_result_cache_bytes': ('Bytes in the result cache', 'gauge', cache['bytes']),
+        'dataobject_jobs_active': ('Jobs queued or running', 'gauge', job_queue.active()),
+    }
+    return Response(metrics.prometheus(extra), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,165 @@
+"""
+Serializers for data object surfaces.
+
+The surface is formatted in blocks of rows rather than one cell at a
+time, and handed out as a generator of text chunks so that Flask can
+stream it to the client without building the whole file in memory.
+
+Besides the text format, which is what OpenSCAD surface() reads, there
+are a few more compact ones, registered in FORMATS by name.
+"""
+
+import io
+import struct
+import zlib
+from collections import namedtuple
+import numpy as np
+from make_a_data_object.mesh import iter_surface_obj, iter_surface_stl
+from make_a_data_object.rle import iter_rle
+
+
+def _format_block(block, precision=None):
+    """Format a 2-D block of heights as space separated rows.
+
+    With precision None, each height is written as the shortest
+    repr of the float, just like str(float(y)) does.
+    """
+    if precision is None:
+        return "\n".join(" ".join(map(repr, row)) for row in block.tolist())
+    rowformat = " ".join(["%.{}f".format(precision)] * block.shape[1])
+    return "\n".join(rowformat % tuple(row) for row in block.tolist())
+
+
+def iter_text(surface, precision=None, block_rows=64):
+    """Generate the OpenSCAD surface() compatible text of a surface.
+
+    Parameters
+    ----------
+    surface : np.array
+        2-D matrix of heights
+    precision : int
+        Number of decimals to format heights with. None (default)
+        keeps the full float repr
+    block_rows : int
+        Number of rows formatted in one go (default 64)
+
+    Yields
+    ------
+    str
+        Chunks of text, which joined together are rows separated by
+        newlines, and heights within a row separated by spaces
+    """
+    surface = np.asarray(surface)
+    for start in range(0, surface.shape[0], block_rows):
+        chunk = _format_block(surface[start:start + block_rows], precision)
+        yield chunk if start == 0 else "\n" + chunk
+
+
+def write_text(surface, fd, precision=None, block_rows=64):
+    """Write the surface text to an open file object fd."""
+    for chunk in iter_text(surface, precision, block_rows):
+        fd.write(chunk)
+    fd.write("\n")
+
+
+def iter_float32(surface, block_rows=64):
+    """Generate the surface as raw little-endian float32, row major."""
+    surface = np.asarray(surface)
+    for start in range(0, surface.shape[0], block_rows):
+        yield surface[start:start + block_rows].astype('<f4').tobytes()
+
+
+def iter_npy(surface, block_rows=64):
+    """Generate the surface as a .npy file, which np.load can mmap."""
+    surface = np.asarray(surface)
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        'descr': np.lib.format.dtype_to_descr(surface.dtype),
+        'fortran_order': False,
+        'shape': surface.shape})
+    yield buffer.getvalue()
+    for start in range(0, surface.shape[0], block_rows):
+        yield np.ascontiguousarray(surface[start:start + block_rows]).tobytes()
+
+
+def iter_gzip(surface, precision=None, block_rows=64):
+    """Generate gzip compressed surface text."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in iter_text(surface, precision, block_rows):
+        yield compressor.compress(chunk.encode())
+    yield compressor.compress(b"\n") + compressor.flush()
+
+
+def _png_chunk(kind, data):
+    """A PNG chunk: length, type, data and CRC of type and data."""
+    return (struct.pack(">I", len(data)) + kind + data +
+            struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+
+def iter_png(surface, zmax=None, block_rows=64):
+    """Generate the surface as a 16-bit grayscale PNG heightmap.
+
+    Heights from 0 to zmax (default the maximum of the surface) are
+    scaled linearly to the full 16-bit range. zmax is stored in a tEXt
+    chunk, so that the heights can be scaled back.
+
+    The rows are compressed block_rows at a time into one stream, which
+    is split over as many IDAT chunks as it comes out in.
+    """
+    surface = np.asarray(surface)
+    zmax = float(zmax or surface.max() or 1)
+    height, width = surface.shape
+
+    yield b"\x89PNG\r\n\x1a\n"
+    # width, height, bit depth 16, color type 0 (grayscale), compression,
+    # filter and interlace methods 0
+    yield _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 16, 0, 0, 0, 0))
+    yield _png_chunk(b"tEXt", "zmax\0{!r}".format(zmax).encode())
+    compressor = zlib.compressobj(6)
+    for start in range(0, height, block_rows):
+        block = surface[start:start + block_rows]
+        pixels = np.empty((len(block), 1 + 2 * width), dtype=np.uint8)
+        # Filter type 0 (None) in front of each row
+        pixels[:, 0] = 0
+        pixels[:, 1:] = (np.clip(block / zmax, 0, 1) * 65535).round().astype('>u2').view(np.uint8)
+        data = compressor.compress(pixels.tobytes())
+        if data:
+            yield _png_chunk(b"IDAT", data)
+    yield _png_chunk(b"IDAT", compressor.flush())
+    yield _png_chunk(b"IEND", b"")
+
+
+Format = namedtuple('Format', ['mimetype', 'extension', 'writer', 'options'])
+
+FORMATS = {
+    'dat': Format('text/plain', '.dat', iter_text, ('precision',)),
+    'gz': Format('application/gzip', '.dat.gz', iter_gzip, ('precision',)),
+    'rle': Format('text/x-surface-rle', '.rle', iter_rle, ('precision',)),
+    'raw': Format('application/octet-stream', '.f32', iter_float32, ()),
+    'npy': Format('application/x-npy', '.npy', iter_npy, ()),
+    'png': Format('image/png', '.png', iter_png, ('zmax',)),
+    'stl': Format('model/stl', '.stl', iter_surface_stl, ('tolerance',)),
+    'obj': Format('model/obj', '.obj', iter_surface_obj, ('tolerance',)),
+}
+
+
+def serialize(surface, fmt='dat', **options):
+    """Generate the surface in format fmt, one of FORMATS.
+
+    Options not understood by the format are ignored, so that the
+    caller does not need to know which format wants what.
+    """
+    try:
+        serializer = FORMATS[fmt]
+    except KeyError:
+        raise ValueError("unknown format {}, expected one of {}".format(fmt, ", ".join(FORMATS)))
+    return serializer.writer(surface, **{key: value for key, value in options.items()
+                                         if key in serializer.options})
+
+
+def format_for_mimetype(mimetype):
+    """Name of the format with the given mimetype, or None."""
+    for name, serializer in FORMATS.items():
+        if serializer.mimetype == mimetype:
+            return name
+    return None
@@ -0,0 +1,109 @@
+"""
+Tiled building of very large data objects.
+
+Building an object the usual way needs its whole surface in memory, and
+a few times that on the way, which at large-format sizes like 5000
+runs into gigabytes. Here the surface is made in blocks of rows instead,
+each written straight to a memory-mapped file, so that memory use stays
+about the same whatever the size.
+
+With the separable method the vectors are blurred once, and each block
+is just their outer product, so the blocks need no overlap. The dense
+method blurs each block of the matrix, with as many extra rows above
+and below as the Gaussian kernel reaches, which are then dropped.
+"""
+
+import tempfile
+import numpy as np
+from make_a_data_object.instrumentation import stage
+from make_a_data_object.models import AdditiveDataObject
+from make_a_data_object.resampling import resample
+
+# Sizes from which batches and background jobs are built tiled
+TILED_SIZE = 2000
+
+
+def kernel_radius(alpha, truncate=4.0):
+    """Rows the Gaussian blur reaches, as scipy.ndimage counts them."""
+    return int(truncate * (alpha or 0) + 0.5)
+
+
+def iter_row_blocks(size, block_rows):
+    """Start and stop of each block of rows."""
+    for start in range(0, size, block_rows):
+        yield start, min(size, start + block_rows)
+
+
+def calculate_rows(data_object, xd, yd, start, stop, alpha=0, method='separable', out=None):
+    """Rows start to stop of data_object.calculate_surface(0, xd, yd, ...)
+    without the rest of it. xd and yd are padded with the border already,
+    and for the separable method blurred already as well.
+    """
+    if method != 'dense':
+        return data_object.outer_surface(xd[start:stop], yd, 0, method, out=out)
+    radius = kernel_radius(alpha)
+    low, high = max(0, start - radius), min(len(xd), stop + radius)
+    block = data_object.outer_surface(xd[low:high], yd, alpha, method)[start - low:stop - low]
+    if out is None:
+        return block
+    out[...] = block
+    return out
+
+
+def tiled_data_object(abstract, precipitation, daylength, cls=AdditiveDataObject,
+                      filename=None, size=450, base=50, border=25, limit=None, alpha=None,
+                      method='separable', dtype=np.float64, encoding='wordlength',
+                      block_rows=256):
+    """Build a data object with its surface memory-mapped, in blocks of rows.
+
+    Parameters
+    ----------
+    abstract, precipitation, daylength, size, base, border, limit, alpha, method, dtype, encoding
+        As for the DataObject constructor
+    cls : type
+        The DataObject class to build (default AdditiveDataObject)
+    filename : string
+        File to map the surface to. None (default) maps it to a
+        temporary file, which is gone when the object is
+    block_rows : int
+        Number of rows made at a time (default 256)
+
+    Returns
+    -------
+    DataObject
+        An instance of cls, with an np.memmap surface equal to that of
+        cls(abstract, precipitation, daylength, ...)
+    """
+    cls.check_arguments(abstract, precipitation, size, border, limit, alpha)
+    data_object = cls.__new__(cls)
+    data_object.size = size
+    data_object.base = base
+    data_object.border = border
+    data_object.daylength = daylength
+    with stage('interpolation'):
+        data_object.abstract = resample(
+            cls.vectorize_abstract(abstract, limit=limit, encoding=encoding),
+            data_object.data_size)
+    data_object.precipitation = data_object.signal(precipitation, daylength)
+
+    xd = np.pad(np.asarray(data_object.abstract, dtype=float), border)
+    yd = np.pad(np.asarray(data_object.precipitation, dtype=float), border)
+    if method == 'separable':
+        xd, yd = cls.smooth(xd, alpha or 0), cls.smooth(yd, alpha or 0)
+    if filename:
+        surface = np.memmap(filename, dtype=dtype, mode='w+', shape=(size, size))
+    else:
+        # The mapping outlives the file object, and the file is gone with it
+        with tempfile.TemporaryFile() as fd:
+            surface = np.memmap(fd, dtype=dtype, mode='w+', shape=(size, size))
+    for start, stop in iter_row_blocks(size, block_rows):
+        with stage('calculate_rows') as s:
+            rows = calculate_rows(data_object, xd, yd, start, stop, alpha, method,
+                                  out=surface[start:stop])
+            # Smoothing overflows onto the border. Compensate by pulling it to zero
+            data_object.zero_border(rows, border, start, size)
+            s.output = rows.nbytes
+        data_object.scale_and_clip(rows)
+    surface.flush()
+    data_object.surface = surface
+    return data_object
@@ -0,0 +1,94 @@
+"""
+Vectors of abstracts.
+
+An abstract is read a word at a time, stopping after limit words, so a
+whole paper pasted in costs no more than its first limit words. Each
+word is encoded as one or more numbers, and the vector of the abstract
+is how much each word differs from the one before it, the first word
+from the last.
+
+The encodings work on all the words at once, on an array of their
+characters, and are registered in ENCODINGS by name.
+"""
+
+import itertools
+import re
+import numpy as np
+
+WORD = re.compile(r'\S+')
+VOWELS = np.array([ord(c) for c in "aeiouyæøåAEIOUYÆØÅ"], dtype='<u4')
+
+
+def words(abstract, limit=None):
+    """The first limit words of the abstract, all of them if limit is None."""
+    return [match.group() for match in itertools.islice(WORD.finditer(abstract), limit)]
+
+
+def characters(tokens):
+    """Code points of all the tokens, and the index of the token of each."""
+    lengths = np.fromiter(map(len, tokens), dtype=np.intp, count=len(tokens))
+    codes = np.frombuffer("".join(tokens).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    return codes, np.repeat(np.arange(len(tokens)), lengths)
+
+
+def word_lengths(tokens):
+    """Number of characters in each word."""
+    return np.fromiter(map(len, tokens), dtype=int, count=len(tokens))
+
+
+def syllables(tokens):
+    """Rough number of syllables in each word, as groups of vowels."""
+    codes, owner = characters(tokens)
+    vowel = np.isin(codes, VOWELS)
+    # A group starts at a vowel after a consonant or at the start of a word
+    follows_vowel = np.zeros_like(vowel)
+    follows_vowel[1:] = vowel[:-1] & (owner[1:] == owner[:-1])
+    return np.bincount(owner[vowel & ~follows_vowel], minlength=len(tokens))
+
+
+def character_classes(tokens):
+    """Histogram of lowercase, uppercase, digits, other ASCII and
+    non-ASCII characters in each word, as a (words, 5) matrix.
+    """
+    codes, owner = characters(tokens)
+    kind = np.select([(codes >= ord('a')) & (codes <= ord('z')),
+                      (codes >= ord('A')) & (codes <= ord('Z')),
+                      (codes >= ord('0')) & (codes <= ord('9')),
+                      codes < 128],
+                     [0, 1, 2, 3], 4)
+    return np.bincount(owner * 5 + kind, minlength=len(tokens) * 5).reshape(-1, 5)
+
+
+ENCODINGS = {
+    'wordlength': word_lengths,
+    'syllables': syllables,
+    'charclass': character_classes,
+}
+
+
+def vectorize(abstract, limit=None, encoding='wordlength'):
+    """Vector of the abstract, up to limit words.
+
+    Parameters
+    ----------
+    abstract : string
+        The abstract
+    limit : int
+        Number of words to read, None (default) for all
+    encoding : string
+        How words are encoded, one of ENCODINGS (default 'wordlength')
+
+    Returns
+    -------
+    np.array
+        For each word, the distance of its encoding from that of the
+        word before it, and for the first word from the last one
+    """
+    try:
+        encode = ENCODINGS[encoding]
+    except KeyError:
+        raise ValueError("unknown encoding {}, expected one of {}".format(
+            encoding, ", ".join(ENCODINGS)))
+    features = encode(words(abstract, limit))
+    distance = np.abs(features - np.roll(features, 1, axis=0))
+    return distance.sum(axis=1) if distance.ndim > 1 else distance
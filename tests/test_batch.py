@@ -0,0 +1,54 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from make_a_data_object.batch import generate_batch, main, normalize
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.param_sets = [
+            {'abstract': "lorem ipsum dolor sit amet", 'precipitation': "1, 2, 3, 4",
+             'daylength': "12:30", 'size': 60, 'border': 5, 'filename': 'first.dat'},
+            {'abstract': "kittens", 'precipitation': [1, 2, 3, 4], 'daylength': 12,
+             'size': 60, 'border': 5},
+            {'abstract': "lorem ipsum dolor sit amet", 'precipitation': [1, 2, 3, 4],
+             'daylength': 12, 'size': 60, 'border': 5, 'format': 'stl'},
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_failure_does_not_abort_the_batch(self):
+        results = sorted(generate_batch(self.param_sets, self.directory.name, processes=2),
+                         key=lambda result: result['index'])
+        self.assertEqual([0, 1, 2], [result['index'] for result in results])
+        self.assertIsNone(results[0]['error'])
+        self.assertIsNotNone(results[1]['error'])
+        self.assertIsNone(results[2]['error'])
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, 'first.dat')))
+        self.assertTrue(results[2]['filename'].endswith('.stl'))
+
+    def test_complement_flag(self):
+        for value, expected in (("False", False), ("0", False), ("", False), (None, False),
+                                (False, False), ("true", True), ("1", True), (True, True)):
+            params = dict(self.param_sets[0], complement=value)
+            self.assertIs(expected, normalize(params)['complement'], value)
+
+    def test_command_line(self):
+        parameters = os.path.join(self.directory.name, 'parameters.jsonl')
+        with open(parameters, 'w') as fd:
+            for params in self.param_sets:
+                fd.write(json.dumps(params) + "\n")
+        with contextlib.redirect_stdout(io.StringIO()) as out, \
+                contextlib.redirect_stderr(io.StringIO()):
+            status = main([parameters, '-o', self.directory.name, '-j', '2'])
+        self.assertEqual(1, status)
+        self.assertEqual(3, len(out.getvalue().splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
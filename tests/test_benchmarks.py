@@ -0,0 +1,22 @@
+import unittest
+from benchmarks.bench_dataobject import bench_stages, compare
+from make_a_data_object.models import AdditiveDataObject
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_compare(self):
+        baseline = {'a/construct': 1.0, 'b/str': 1.0, 'make/dat/requests_per_second': 10.0}
+        results = {'a/construct': 1.4, 'b/str': 2.0, 'make/dat/requests_per_second': 5.0,
+                   'c/new': 1.0}
+        regressions = compare(results, baseline, threshold=1.5)
+        self.assertEqual(['b/str', 'make/dat/requests_per_second'],
+                         sorted(name for name, _, _, _ in regressions))
+
+    def test_stages(self):
+        stages = bench_stages(AdditiveDataObject, 60, 2, 10, repeat=1)
+        self.assertIn('calculate_surface', stages)
+        self.assertTrue(all(seconds > 0 for seconds in stages.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from make_a_data_object.builder import DataObjectBuilder
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+
+
+class TestDataObjectBuilder(unittest.TestCase):
+    def setUp(self):
+        self.params = dict(abstract=Data.a, precipitation=list(Data.p), daylength=12,
+                           size=100, border=10, limit=20, alpha=5)
+        self.builder = DataObjectBuilder(**self.params)
+        self.first = self.builder.build()
+
+    def assertBuiltLike(self, data_object, **params):
+        cls = params.pop('cls', AdditiveDataObject)
+        expected = cls(**dict(self.params, **params))
+        self.assertIsInstance(data_object, cls)
+        np.testing.assert_array_equal(expected.surface, data_object.surface)
+        np.testing.assert_array_equal(expected.precipitation, data_object.precipitation)
+
+    def test_same_as_constructor(self):
+        self.assertBuiltLike(self.first)
+        builder = DataObjectBuilder(DataObject, **self.params)
+        self.assertBuiltLike(builder.build(), cls=DataObject)
+
+    def test_alpha_only_blurs_and_clips(self):
+        self.assertBuiltLike(self.builder.build(alpha=8), alpha=8)
+        self.assertEqual({'abstract_vector': 1, 'abstract': 1, 'signal': 1,
+                          'surface': 2, 'clipped': 2}, self.builder.runs)
+
+    def test_base_only_clips(self):
+        self.assertBuiltLike(self.builder.build(base=30), base=30)
+        self.assertEqual(1, self.builder.runs['surface'])
+        self.assertEqual(2, self.builder.runs['clipped'])
+
+    def test_precipitation_keeps_abstract(self):
+        self.params['precipitation'].append(2.0)
+        self.assertBuiltLike(self.builder.build(precipitation=self.params['precipitation']))
+        self.assertEqual(1, self.builder.runs['abstract'])
+        self.assertEqual(2, self.builder.runs['signal'])
+
+    def test_abstract_keeps_signal(self):
+        self.assertBuiltLike(self.builder.build(abstract="kittens are very fluffy indeed"),
+                             abstract="kittens are very fluffy indeed")
+        self.assertEqual(1, self.builder.runs['signal'])
+
+    def test_unchanged_builds_nothing(self):
+        self.builder.build(daylength=12)
+        self.assertEqual(set([1]), set(self.builder.runs.values()))
+
+    def test_earlier_objects_stay(self):
+        surface = self.first.surface.copy()
+        self.builder.build(alpha=1, base=20)
+        np.testing.assert_array_equal(surface, self.first.surface)
+
+    def test_unknown_parameter(self):
+        with self.assertRaisesRegex(TypeError, "kittens"):
+            self.builder.update(kittens=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from make_a_data_object.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_key_is_normalized(self):
+        self.assertEqual(ResultCache.key(precipitation=[1, 2], size=450),
+                         ResultCache.key(size=450, precipitation=np.array([1.0, 2.0])))
+        self.assertNotEqual(ResultCache.key(precipitation=[1, 2], size=450),
+                            ResultCache.key(precipitation=[1, 2], size=451))
+
+    def test_hits_and_misses(self):
+        cache = ResultCache()
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', b"kittens")
+        self.assertEqual(b"kittens", cache.get('a'))
+        self.assertEqual((1, 1), (cache.stats()['hits'], cache.stats()['misses']))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResultCache(max_bytes=10)
+        cache.put('a', b"1234")
+        cache.put('b', b"1234")
+        cache.get('a')
+        cache.put('c', b"1234")
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(b"1234", cache.get('a'))
+        self.assertEqual(8, cache.stats()['bytes'])
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ResultCache(directory=directory).put('a', b"kittens")
+            self.assertEqual(b"kittens", ResultCache(directory=directory).get('a'))
+
+    def test_tee(self):
+        cache = ResultCache()
+        self.assertEqual([b"a", b"b"], list(cache.tee('k', iter(["a", b"b"]))))
+        self.assertEqual(b"ab", cache.get('k'))
+
+    def test_tee_too_big_for_memory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(max_bytes=3, directory=directory)
+            self.assertEqual([b"ab", b"cd"], list(cache.tee('k', iter([b"ab", b"cd"]))))
+            self.assertEqual(0, cache.stats()['entries'])
+            self.assertEqual(b"abcd", cache.get('k'))
+
+    def test_tee_interrupted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            chunks = cache.tee('k', iter([b"ab", b"cd"]))
+            next(chunks)
+            chunks.close()
+            self.assertEqual([], os.listdir(directory))
+            self.assertIsNone(cache.get('k'))
+
+    def test_disk_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(max_bytes=0, directory=directory, max_disk_bytes=10)
+            cache.put('a', b"1234")
+            cache.put('b', b"1234")
+            os.utime(os.path.join(directory, 'a'), (0, 0))
+            os.utime(os.path.join(directory, 'b'), (1, 1))
+            cache.get('a')
+            cache.put('c', b"1234")
+            self.assertEqual(['a', 'c'], sorted(os.listdir(directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import datetime
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from make_a_data_object.daylength import DayLengthProvider, format_hours, solar_day_length
+from make_a_data_object.models import Day
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers like api.sunrise-sunset.org, counting the calls."""
+    calls = 0
+
+    def do_GET(self):
+        StubHandler.calls += 1
+        body = json.dumps({'results': {'day_length': '10:11:12'}, 'status': 'OK'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSolarDayLength(unittest.TestCase):
+    def test_copenhagen(self):
+        # Roughly 17:30 at midsummer and 7:00 at midwinter
+        self.assertAlmostEqual(17.5, solar_day_length(datetime.date(2019, 6, 21), 55.67), delta=0.2)
+        self.assertAlmostEqual(7.0, solar_day_length(datetime.date(2019, 12, 21), 55.67), delta=0.2)
+
+    def test_format_hours(self):
+        self.assertEqual("7:05:30", format_hours(7 + 5.5 / 60))
+
+
+class TestDayLengthProvider(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = 'http://127.0.0.1:{}/json'.format(self.server.server_port)
+        StubHandler.calls = 0
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_lookup_is_cached(self):
+        provider = DayLengthProvider(self.endpoint)
+        self.assertEqual('10:11:12', provider.day_length(55.67, 12.56))
+        self.assertEqual('10:11:12', provider.day_length(55.671, 12.559))
+        self.assertEqual(1, StubHandler.calls)
+
+    def test_stale_is_served_while_refreshed(self):
+        provider = DayLengthProvider(self.endpoint, retry_interval=0)
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        provider.entries[(55.67, 12.56)] = (yesterday, '9:00:00', True)
+        self.assertEqual('9:00:00', provider.day_length(55.67, 12.56))
+        for _ in range(100):
+            if provider.entries[(55.67, 12.56)][0] != yesterday:
+                break
+            time.sleep(0.01)
+        self.assertEqual('10:11:12', provider.day_length(55.67, 12.56))
+
+    def test_fallback(self):
+        provider = DayLengthProvider('http://127.0.0.1:1/json', timeout=0.5)
+        date = datetime.date(2019, 6, 21)
+        self.assertEqual(format_hours(solar_day_length(date, 55.67)),
+                         provider.day_length(55.67, 12.56, date))
+
+    def test_day(self):
+        provider = DayLengthProvider(self.endpoint)
+        self.assertEqual('10:11', Day(provider=provider).length())
+
+
+if __name__ == '__main__':
+    unittest.main()
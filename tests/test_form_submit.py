@@ -46,6 +46,60 @@ class TestFormSubmit(unittest.TestCase):
         rv = self.app.post('/make', data=self.form_input)
         self.assertEqual(200, rv.status_code)
 
+    def test_format_field(self):
+        self.form_input['format'] = 'npy'
+        rv = self.app.post('/make', data=self.form_input)
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual('application/x-npy', rv.mimetype)
+        self.assertIn('dataobject.npy', rv.headers['content-disposition'])
+
+    def test_format_from_accept_header(self):
+        rv = self.app.post('/make', data=self.form_input,
+                           headers={'Accept': 'image/png'})
+        self.assertEqual('image/png', rv.mimetype)
+
+    def test_default_format_is_text(self):
+        rv = self.app.post('/make', data=self.form_input,
+                           headers={'Accept': '*/*'})
+        self.assertEqual('text/plain', rv.mimetype)
+
+    def test_stl_of_complement(self):
+        rv = self.app.post('/make?format=stl&complement=1', data=self.form_input)
+        self.assertEqual('model/stl', rv.mimetype)
+        self.assertIn('dataobject.stl', rv.headers['content-disposition'])
+
+    def test_complement_false(self):
+        plain = self.app.post('/make?format=png', data=self.form_input).data
+        for value in ("0", "false", "off"):
+            rv = self.app.post('/make?format=png&complement=' + value, data=self.form_input)
+            self.assertEqual(plain, rv.data)
+        complement = self.app.post('/make?format=png&complement=yes', data=self.form_input).data
+        self.assertNotEqual(plain, complement)
+
+    def test_repeated_request_is_cached(self):
+        self.form_input['abstract'] = "a cached abstract is a happy abstract"
+        first = self.app.post('/make', data=self.form_input).data
+        hits = self.app.get('/cache').get_json()['hits']
+        second = self.app.post('/make', data=self.form_input).data
+        self.assertEqual(first, second)
+        self.assertEqual(hits + 1, self.app.get('/cache').get_json()['hits'])
+
+    def test_precision_out_of_range(self):
+        for precision in ("-1", "18"):
+            self.form_input['precision'] = precision
+            rv = self.app.post('/make', data=self.form_input)
+            self.assertEqual(400, rv.status_code)
+
+    def test_large_decimated_mesh(self):
+        self.form_input.update(size="2000", format="stl", tolerance="1")
+        rv = self.app.post('/make', data=self.form_input)
+        self.assertEqual(400, rv.status_code)
+
+    def test_unknown_format(self):
+        self.form_input['format'] = 'kittens'
+        rv = self.app.post('/make', data=self.form_input)
+        self.assertEqual(400, rv.status_code)
+
     def test_missing_abstract(self):
         del(self.form_input['abstract'])
         with self.assertRaisesRegex(BadRequestKeyError, "abstract"):
@@ -92,5 +146,38 @@ class TestFormSubmit(unittest.TestCase):
             self.app.post('/make', data=self.form_input)
 
 
+class TestPreview(unittest.TestCase):
+    def setUp(self):
+        make_a_data_object.app.testing = True
+        self.app = make_a_data_object.app.test_client()
+        self.form_input = {
+            'abstract': "lorem ipsum something something",
+            'precipitation': "1, 2, 3, 4",
+            'daylength': "12",
+            'smoothing': "",
+            'limit': "",
+            'format': "dat"}
+
+    def test_png(self):
+        rv = self.app.post('/preview', data=self.form_input)
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual('image/png', rv.mimetype)
+        self.assertTrue(rv.data.startswith(b"\x89PNG"))
+
+    def test_json(self):
+        rv = self.app.post('/preview?format=json', data=self.form_input)
+        heights = rv.get_json()['heights']
+        self.assertEqual(make_a_data_object.app.config['PREVIEW_SIZE'], len(heights))
+        self.assertEqual(len(heights), len(heights[0]))
+
+    def test_half_filled_form(self):
+        self.form_input['abstract'] = "kittens"
+        self.assertEqual(400, self.app.post('/preview', data=self.form_input).status_code)
+        self.form_input['precipitation'] = "1, 2,"
+        self.assertEqual(400, self.app.post('/preview', data=self.form_input).status_code)
+        del(self.form_input['daylength'])
+        self.assertEqual(400, self.app.post('/preview', data=self.form_input).status_code)
+
+
 if __name__ == '__main__':
     unittest.main()
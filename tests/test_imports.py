@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+
+IMPORT_TIME = """
+import sys, time
+start = time.perf_counter()
+import make_a_data_object
+print(time.perf_counter() - start)
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+class TestColdStart(unittest.TestCase):
+    """The web app must not import what only plotting or lookups need."""
+    def setUp(self):
+        output = subprocess.run([sys.executable, '-c', IMPORT_TIME], check=True,
+                                capture_output=True, text=True).stdout.splitlines()
+        self.seconds = float(output[0])
+        self.modules = output[1].split()
+
+    def test_plotting_is_not_imported(self):
+        for module in ('matplotlib', 'mpl_toolkits', 'seaborn', 'pandas'):
+            self.assertNotIn(module, self.modules)
+
+    def test_lazy_imports_are_not_imported(self):
+        self.assertNotIn('requests', self.modules)
+        self.assertNotIn('scipy.interpolate', self.modules)
+
+    def test_import_time(self):
+        # Generous, importing the plotting libraries alone takes longer
+        self.assertLess(self.seconds, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
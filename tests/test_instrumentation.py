@@ -0,0 +1,100 @@
+import tracemalloc
+import unittest
+import make_a_data_object
+from make_a_data_object.instrumentation import NULL_STAGE, Metrics, instrumented, metrics, stage
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus(self):
+        m = Metrics()
+        m.record('blur', 0.5, output=8)
+        m.record('blur', 0.25, output=8)
+        text = m.prometheus({'jobs': ('Jobs', 'gauge', 3)})
+        self.assertIn('dataobject_stage_calls_total{stage="blur"} 2', text)
+        self.assertIn('dataobject_stage_seconds_total{stage="blur"} 0.75', text)
+        self.assertIn('dataobject_stage_output_bytes_total{stage="blur"} 16', text)
+        self.assertIn("# TYPE jobs gauge\njobs 3\n", text)
+        self.assertNotIn('allocated_bytes', text)
+        tracemalloc.start()
+        try:
+            self.assertIn('allocated_bytes', m.prometheus())
+        finally:
+            tracemalloc.stop()
+
+    def test_collect(self):
+        m = Metrics(enabled=False)
+        m.record('before', 1.0)
+        m.collect()
+        m.record('during', 1.0)
+        self.assertEqual([('during', 1.0)], m.collected())
+        self.assertEqual([], m.collected())
+        self.assertEqual({}, dict(m.totals))
+
+
+class TestStage(unittest.TestCase):
+    def setUp(self):
+        self.enabled = metrics.enabled
+        metrics.enabled = True
+
+    def tearDown(self):
+        metrics.enabled = self.enabled
+
+    def test_stage(self):
+        calls = metrics.totals['test_stage'][0]
+        with stage('test_stage') as s:
+            s.output = 10
+        self.assertEqual(calls + 1, metrics.totals['test_stage'][0])
+
+    def test_disabled(self):
+        metrics.enabled = False
+        self.assertIs(NULL_STAGE, stage('test_disabled'))
+        self.assertEqual([b"a"], list(instrumented('test_disabled', [b"a"])))
+        self.assertNotIn('test_disabled', metrics.totals)
+
+    def test_memory(self):
+        tracemalloc.start()
+        try:
+            with stage('test_memory'):
+                block = bytearray(2**20)
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(metrics.totals['test_memory'][2], len(block) // 2)
+
+    def test_instrumented(self):
+        self.assertEqual([b"ab", b"c"], list(instrumented('test_instrumented', [b"ab", b"c"])))
+        self.assertEqual(3, metrics.totals['test_instrumented'][3])
+
+
+class TestRoutes(unittest.TestCase):
+    def setUp(self):
+        make_a_data_object.app.testing = True
+        self.app = make_a_data_object.app.test_client()
+
+    def test_metrics(self):
+        rv = self.app.post('/make', data=dict(
+            abstract="Many instrumented kittens are playing with yarn.", precipitation="1,2,3,4",
+            daylength="12:00", smoothing="5", limit="20"))
+        # Serialization is streamed, so it is only recorded once read
+        self.assertTrue(rv.data)
+        rv = self.app.get('/metrics')
+        self.assertEqual(200, rv.status_code)
+        self.assertTrue(rv.content_type.startswith('text/plain'))
+        for name in (b'stage="calculate_surface"', b'stage="serialize_dat"',
+                     b'dataobject_result_cache_hits_total', b'dataobject_jobs_active'):
+            self.assertIn(name, rv.data)
+
+    def test_server_timing(self):
+        rv = self.app.post('/make?timing=1', data=dict(
+            abstract="Some timed kittens are sleeping on the sofa.", precipitation="1,2,3,4",
+            daylength="12:00", smoothing="5", limit="20"))
+        self.assertEqual(200, rv.status_code)
+        self.assertIn('calculate_surface;dur=', rv.headers['Server-Timing'])
+        self.assertIn('build;dur=', rv.headers['Server-Timing'])
+
+    def test_no_server_timing(self):
+        rv = self.app.get('/hello')
+        self.assertNotIn('Server-Timing', rv.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import make_a_data_object
+from make_a_data_object import routes
+from make_a_data_object.jobs import JobQueue, QueueFull, render
+from make_a_data_object.models import Data
+
+
+def wait_for(poll, seconds=30):
+    """Poll until it returns something other than queued or running."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        status = poll()
+        if status not in ('queued', 'running'):
+            return status
+        time.sleep(0.05)
+    return status
+
+
+def hold(started, release):
+    """Tell that the job has started, and wait until released."""
+    started.set()
+    return release.wait(30)
+
+
+class TestJobQueue(unittest.TestCase):
+    def test_result(self):
+        queue = JobQueue(workers=1)
+        job = queue.submit(pow, 2, 10)
+        self.assertEqual('done', wait_for(job.status))
+        self.assertEqual(1024, queue.result(job.id))
+
+    def test_failure(self):
+        queue = JobQueue(workers=1)
+        job = queue.submit(int, "kittens")
+        self.assertEqual('failed', wait_for(job.status))
+        self.assertIsInstance(queue.error(job.id), ValueError)
+        self.assertIsNone(queue.result(job.id))
+
+    def test_backpressure_and_cancel(self):
+        # The worker is held until the event is set. Besides the job it
+        # runs, the pool hands at most two more to its call queue, and
+        # those cannot be cancelled any more, but the fourth can
+        with multiprocessing.Manager() as manager:
+            event = manager.Event()
+            queue = JobQueue(workers=1, max_jobs=4)
+            held = [queue.submit(event.wait, 30) for i in range(3)]
+            queued = queue.submit(event.wait, 30)
+            with self.assertRaises(QueueFull):
+                queue.submit(event.wait, 30)
+            self.assertTrue(queue.cancel(queued.id))
+            self.assertEqual('cancelled', queued.status())
+            self.assertEqual(3, queue.active())
+            queue.submit(event.wait, 30)
+            event.set()
+            self.assertEqual(['done'] * 3, [wait_for(job.status) for job in held])
+
+    def test_timeout_keeps_the_worker(self):
+        with multiprocessing.Manager() as manager:
+            started, release = manager.Event(), manager.Event()
+            queue = JobQueue(workers=1, timeout=0)
+            try:
+                job = queue.submit(hold, started, release)
+                self.assertTrue(started.wait(30))
+                self.assertEqual('timeout', queue.get(job.id).status())
+                self.assertEqual(1, queue.active())
+                release.set()
+                job.future.result(30)
+                self.assertEqual(0, queue.active())
+                self.assertEqual('timeout', job.status())
+            finally:
+                release.set()
+                queue.pool.shutdown()
+
+    def test_broken_pool_is_replaced(self):
+        queue = JobQueue(workers=1)
+        dead = queue.submit(os._exit, 1)
+        self.assertEqual('failed', wait_for(dead.status))
+        job = queue.submit(pow, 2, 10)
+        self.assertEqual('done', wait_for(job.status))
+        self.assertEqual(1024, queue.result(job.id))
+
+    def test_large_result_is_a_file(self):
+        params = {'abstract': Data.a, 'precipitation': Data.p, 'daylength': 12, 'size': 60,
+                  'base': 50, 'border': 5, 'limit': 20, 'alpha': 5, 'format': 'dat',
+                  'precision': 2, 'complement': False, 'tolerance': None}
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch('make_a_data_object.jobs.TILED_SIZE', 50):
+                filename = render(params, directory)
+            # The text written to a file ends with a newline, the streamed one not
+            with open(filename, 'rb') as fd:
+                self.assertEqual(render(params), fd.read().rstrip(b"\n"))
+            queue = JobQueue(workers=1, retention=0)
+            job = queue.submit(os.path.join, filename)
+            self.assertEqual('done', wait_for(job.status))
+            self.assertIsNotNone(queue.get(job.id))
+            time.sleep(0.01)
+            self.assertIsNone(queue.get(job.id))
+            self.assertFalse(os.path.exists(filename))
+
+
+class TestAsyncMake(unittest.TestCase):
+    def setUp(self):
+        make_a_data_object.app.testing = True
+        self.app = make_a_data_object.app.test_client()
+        self.form_input = {
+            'abstract': "lorem ipsum something something asynchronous",
+            'precipitation': "1, 2, 3, 4",
+            'daylength': "12",
+            'smoothing': "",
+            'limit': "",
+            'size': "100",
+            'mode': "async"}
+
+    def test_job_lifecycle(self):
+        rv = self.app.post('/make', data=self.form_input)
+        self.assertEqual(202, rv.status_code)
+        job = rv.get_json()
+        self.assertEqual(rv.headers['Location'], job['status_url'])
+        status = wait_for(lambda: self.app.get(job['status_url']).get_json()['status'])
+        self.assertEqual('done', status)
+        rv = self.app.get(job['result_url'])
+        self.assertEqual(200, rv.status_code)
+        self.assertEqual(100, len(rv.data.decode().splitlines()))
+
+    def test_tiled_job(self):
+        self.form_input.update(size="2000", format="raw")
+        job = self.app.post('/make', data=self.form_input).get_json()
+        status = wait_for(lambda: self.app.get(job['status_url']).get_json()['status'])
+        self.assertEqual('done', status)
+        rv = self.app.get(job['result_url'])
+        self.assertEqual(200, rv.status_code)
+        self.assertIn('dataobject.f32', rv.headers['content-disposition'])
+        self.assertEqual(2000 * 2000 * 4, len(rv.data))
+        rv.close()
+
+    def test_failed_job(self):
+        self.form_input['abstract'] = "kittens"
+        job = self.app.post('/make', data=self.form_input).get_json()
+        status = wait_for(lambda: self.app.get(job['status_url']).get_json()['status'])
+        self.assertEqual('failed', status)
+        self.assertIn('error', self.app.get(job['status_url']).get_json())
+        self.assertEqual(409, self.app.get(job['result_url']).status_code)
+
+    def test_size_out_of_range(self):
+        for size in ("40", "50", "100000"):
+            self.form_input['size'] = size
+            self.assertEqual(400, self.app.post('/make', data=self.form_input).status_code)
+
+    def test_unknown_job(self):
+        self.assertEqual(404, self.app.get('/jobs/kittens').status_code)
+        self.assertEqual(404, self.app.delete('/jobs/kittens').status_code)
+
+    def test_queue_full(self):
+        max_jobs = routes.job_queue.max_jobs
+        routes.job_queue.max_jobs = 0
+        self.form_input['abstract'] = "nothing like this was cached before"
+        try:
+            self.assertEqual(429, self.app.post('/make', data=self.form_input).status_code)
+        finally:
+            routes.job_queue.max_jobs = max_jobs
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import tracemalloc
+import unittest
+import numpy as np
+from make_a_data_object.mesh import (heightmap_mesh, iter_obj, iter_stl, iter_surface_obj,
+                                     iter_surface_stl, STL_DTYPE)
+from make_a_data_object.models import AdditiveDataObject
+
+
+def edges_are_shared(faces):
+    """Every directed edge is matched by exactly one opposite edge."""
+    edges = np.concatenate((faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]))
+    directed = set(map(tuple, edges.tolist()))
+    return (len(directed) == len(edges) and
+            all((b, a) in directed for (a, b) in directed))
+
+
+def volume(vertices, faces):
+    triangles = vertices[faces]
+    return np.einsum('ij,ij->i', triangles[:, 0],
+                     np.cross(triangles[:, 1], triangles[:, 2])).sum() / 6
+
+
+class TestHeightmapMesh(unittest.TestCase):
+    def test_flat_block(self):
+        vertices, faces = heightmap_mesh(np.full((4, 5), 2.0))
+        self.assertTrue(edges_are_shared(faces))
+        self.assertAlmostEqual(3 * 4 * 2.0, volume(vertices, faces))
+
+    def test_data_object_is_watertight(self):
+        data_object = AdditiveDataObject(
+            "lorem ipsum dolor sit amet something", [1, 2, 3, 4, 5, 6, 7], 12,
+            size=60, border=5, alpha=2)
+        for surface in (data_object.surface, data_object.get_complement()):
+            vertices, faces = heightmap_mesh(surface)
+            self.assertTrue(edges_are_shared(faces))
+            self.assertGreater(volume(vertices, faces), 0)
+
+    def test_stl(self):
+        vertices, faces = heightmap_mesh(np.arange(12.0).reshape(3, 4) + 1)
+        data = b"".join(iter_stl(vertices, faces, block_faces=5))
+        self.assertEqual(80 + 4 + len(faces) * 50, len(data))
+        self.assertEqual(len(faces), np.frombuffer(data[80:84], dtype='<u4')[0])
+        records = np.frombuffer(data[84:], dtype=STL_DTYPE)
+        np.testing.assert_allclose(vertices[faces], records['vertices'])
+        # top faces point up, floor faces down
+        self.assertGreater(records['normal'][0, 2], 0)
+        self.assertLess(records['normal'][-1, 2], 0)
+
+
+class TestStreamedMesh(unittest.TestCase):
+    def setUp(self):
+        self.surface = AdditiveDataObject(
+            "lorem ipsum dolor sit amet something", [1, 2, 3, 4, 5, 6, 7], 12,
+            size=60, border=5, alpha=2).surface
+
+    def test_same_as_whole(self):
+        vertices, faces = heightmap_mesh(self.surface)
+        for block_rows in (1, 7, 64):
+            self.assertEqual(b"".join(iter_stl(vertices, faces)),
+                             b"".join(iter_surface_stl(self.surface, block_rows=block_rows)))
+            self.assertEqual(b"".join(iter_obj(vertices, faces)),
+                             b"".join(iter_surface_obj(self.surface, block_rows=block_rows)))
+
+    def test_memory_is_bounded(self):
+        surface = np.tile(self.surface, (8, 8))
+        tracemalloc.start()
+        try:
+            size = sum(map(len, iter_surface_stl(surface, block_rows=16)))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # The whole mesh takes more memory than the size of the file
+        self.assertEqual(84 + 50 * (2 * 479 * 479 + 3 * 4 * 479), size)
+        self.assertLess(peak, size / 5)
+
+
+class TestDecimation(unittest.TestCase):
+    def setUp(self):
+        self.surface = AdditiveDataObject(
+            "lorem ipsum dolor sit amet something", [1, 2, 3, 4, 5, 6, 7], 12,
+            size=100, border=10, alpha=3).surface
+
+    def test_flat_block_collapses(self):
+        vertices, faces = heightmap_mesh(np.full((33, 33), 2.0), tolerance=0)
+        self.assertTrue(edges_are_shared(faces))
+        self.assertEqual(2, (vertices[faces][:, :, 2] == 2.0).all(axis=1).sum())
+        self.assertAlmostEqual(32 * 32 * 2.0, volume(vertices, faces))
+
+    def test_decimated_is_watertight_and_smaller(self):
+        full = heightmap_mesh(self.surface)
+        for tolerance in (0, 0.5, 2):
+            vertices, faces = heightmap_mesh(self.surface, tolerance)
+            self.assertTrue(edges_are_shared(faces))
+            self.assertLess(len(faces), len(full[1]))
+            self.assertAlmostEqual(volume(*full), volume(vertices, faces),
+                                   delta=tolerance * 99 * 99)
+
+    def test_obj(self):
+        vertices, faces = heightmap_mesh(self.surface, tolerance=1)
+        lines = b"".join(iter_obj(vertices, faces)).decode().splitlines()
+        self.assertEqual(len(vertices), sum(line.startswith("v ") for line in lines))
+        self.assertEqual(len(faces), sum(line.startswith("f ") for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
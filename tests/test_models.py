@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+
+
+class TestSurfaceMethods(unittest.TestCase):
+    """The separable surface must match blurring the whole matrix."""
+    def test_separable_matches_dense(self):
+        for cls in (DataObject, AdditiveDataObject):
+            for alpha in (None, 0, 1, 5, 20):
+                dense = cls(Data.a, Data.p, 12, size=200, border=20, limit=20,
+                            alpha=alpha, method='dense')
+                separable = cls(Data.a, Data.p, 12, size=200, border=20, limit=20,
+                                alpha=alpha, method='separable')
+                np.testing.assert_allclose(dense.surface, separable.surface, atol=1e-9)
+
+    def test_border_is_zeroed(self):
+        data_object = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5)
+        surface = data_object.calculate_surface(10, data_object.abstract,
+                                                data_object.precipitation, alpha=5)
+        self.assertTrue((surface[:10] == 0).all() and (surface[:, -10:] == 0).all())
+
+    def test_border_of_blocks(self):
+        whole = DataObject.zero_border(np.ones((30, 20)), 4)
+        for start in range(0, 30, 7):
+            block = DataObject.zero_border(np.ones((7, 20))[:30 - start], 4, start, 30)
+            np.testing.assert_array_equal(whole[start:start + 7], block)
+
+    def test_unknown_method(self):
+        with self.assertRaisesRegex(ValueError, "unknown method"):
+            AdditiveDataObject(Data.a, Data.p, 12, method='kittens')
+
+    def test_preview_looks_like_the_object(self):
+        full = AdditiveDataObject(Data.a, Data.p, 12, size=450, border=25, limit=20, alpha=5)
+        preview = AdditiveDataObject.preview(Data.a, Data.p, 12, size=90, full_size=450,
+                                             border=25, limit=20, alpha=5)
+        self.assertEqual((90, 90), preview.surface.shape)
+        self.assertEqual(5, preview.border)
+        # Sampling the full object down at the preview points, scaled down
+        shrunk = full.surface[2::5, 2::5] / 5
+        self.assertLess(np.abs(shrunk - preview.surface)[5:-5, 5:-5].mean(), 1)
+
+
+class TestSurfaceMemory(unittest.TestCase):
+    def setUp(self):
+        self.data_object = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5)
+
+    def test_float32(self):
+        data_object = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5,
+                                         dtype=np.float32)
+        self.assertEqual(np.float32, data_object.surface.dtype)
+        self.assertEqual(np.float32, data_object.get_complement().dtype)
+        np.testing.assert_allclose(self.data_object.surface, data_object.surface, rtol=1e-6)
+
+    def test_grid_is_made_when_needed(self):
+        self.assertNotIn('grid', vars(self.data_object))
+        self.assertEqual((2, 100, 100), self.data_object.grid.shape)
+
+    def test_complement(self):
+        complement = self.data_object.get_complement()
+        expected = np.fliplr(self.data_object.size - self.data_object.surface)
+        np.testing.assert_array_equal(expected[10:-10, 10:-10], complement[10:-10, 10:-10])
+        self.assertTrue((complement[:10] == self.data_object.base).all())
+
+
+class TestDaylight(unittest.TestCase):
+    def setUp(self):
+        self.data_object = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10)
+
+    def test_sun(self):
+        self.assertAlmostEqual(1, self.data_object.sun(6, 12))
+        self.assertAlmostEqual(-1, self.data_object.sun(18, 12))
+        np.testing.assert_allclose([0, 1, 0, -1], self.data_object.sun([0, 6, 12, 18], 12),
+                                   atol=1e-12)
+
+    def test_no_day_and_no_night(self):
+        self.assertLessEqual(self.data_object.sun(12, 0), 0)
+        self.assertGreaterEqual(self.data_object.sun(24, 24), 0)
+
+    def test_profile(self):
+        profile = self.data_object.daylight_profile(75, 12)
+        self.assertEqual(75, len(profile))
+        np.testing.assert_array_equal(profile[:10], profile[10:20])
+        np.testing.assert_allclose(0, profile[70:], atol=1e-12)
+
+    def test_day_length_for_each_day(self):
+        profile = self.data_object.daylight_profile(70, [0, 24, 7, 8, 9, 10, 12.5])
+        self.assertTrue(np.isfinite(profile).all())
+        np.testing.assert_array_equal(self.data_object.daylight_profile(70, 8)[30:40],
+                                      profile[30:40])
+
+    def test_assertions(self):
+        with self.assertRaises(AssertionError):
+            self.data_object.sun(12, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import unittest
+import numpy as np
+from scipy.interpolate import interp1d
+from make_a_data_object.models import AdditiveDataObject, Data
+from make_a_data_object.resampling import cubic_plan, resample
+
+
+class TestResample(unittest.TestCase):
+    def test_matches_interp1d(self):
+        values = np.array([3.2, 0, 0, 0, 4.0, 0.2, 3.1])
+        expected = interp1d(np.linspace(0, 400, 7), values, kind='cubic')(range(400))
+        np.testing.assert_allclose(expected, resample(values, 400), atol=1e-12)
+
+    def test_many_at_once(self):
+        values = np.random.random((7, 5))
+        resampled = resample(values, 100)
+        self.assertEqual((100, 5), resampled.shape)
+        for i in range(5):
+            np.testing.assert_allclose(resample(values[:, i], 100), resampled[:, i])
+
+    def test_long_vectors_are_fitted_directly(self):
+        values = np.random.random((1000, 3))
+        for column in range(3):
+            expected = interp1d(np.linspace(0, 400, 1000), values[:, column], kind='cubic')(range(400))
+            np.testing.assert_allclose(expected, resample(values, 400)[:, column], atol=1e-9)
+        cubic_plan.cache_clear()
+        resample(values, 400)
+        self.assertEqual(0, cubic_plan.cache_info().currsize)
+
+    def test_pasted_paper(self):
+        abstract = " ".join(["kittens", "are", "fluffy", "and", "nice"] * 1400)
+        start = time.perf_counter()
+        data_object = AdditiveDataObject(abstract, Data.p, 12, limit=None)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual((450, 450), data_object.surface.shape)
+
+    def test_plan_is_cached(self):
+        self.assertIs(cubic_plan(7, 100), cubic_plan(7, 100))
+        self.assertFalse(cubic_plan(7, 100).flags.writeable)
+
+    def test_too_few_values(self):
+        with self.assertRaisesRegex(ValueError, "array of size 0"):
+            resample([], 100)
+        for n in (1, 2, 3):
+            with self.assertRaisesRegex(ValueError, "at least 2 entries"):
+                resample(np.ones(n), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
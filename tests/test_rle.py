@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data
+from make_a_data_object.rle import iter_decode, iter_rle, main
+from make_a_data_object.serializers import iter_text, serialize
+
+
+class TestRunLengthEncoding(unittest.TestCase):
+    def setUp(self):
+        self.surface = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5).surface
+
+    def decoded(self, data):
+        return "".join(iter_decode(io.StringIO(data.decode())))
+
+    def test_runs(self):
+        data = b"".join(iter_rle(np.array([[50.0, 50.0, 50.0, 61.25, 50.0], [1.5, 1.5, 2.0, 2.0, 2.0]])))
+        self.assertEqual(b"3*50.0 61.25 50.0\n2*1.5 3*2.0\n", data)
+
+    def test_decodes_to_text(self):
+        for precision in (None, 0, 2):
+            data = b"".join(serialize(self.surface, 'rle', precision=precision))
+            text = "".join(iter_text(self.surface, precision=precision)) + "\n"
+            self.assertEqual(text, self.decoded(data))
+            self.assertLess(len(data), len(text))
+
+    def test_precision_makes_runs(self):
+        surface = np.array([[1.001, 1.002, 1.004, 2.0]])
+        self.assertEqual(b"3*1.00 2.00\n", b"".join(iter_rle(surface, precision=2)))
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'dataobject.rle')
+            with open(filename, 'wb') as fd:
+                fd.writelines(iter_rle(self.surface, precision=2))
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(0, main([filename]))
+        self.assertEqual("".join(iter_text(self.surface, precision=2)) + "\n", out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import gzip
+import io
+import struct
+import unittest
+import zlib
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject
+from make_a_data_object.serializers import iter_text, write_text, serialize
+
+
+class TestTextSerializer(unittest.TestCase):
+    """The streamed text must match the old one-cell-at-a-time output."""
+    def setUp(self):
+        self.data_object = AdditiveDataObject(
+            "lorem ipsum dolor sit amet something", [1, 2, 3, 4, 5, 6, 7], 12,
+            size=100, border=10, alpha=2)
+
+    def reference(self, surface):
+        return "\n".join(" ".join(str(float(y)) for y in row) for row in surface)
+
+    def test_str_matches_reference(self):
+        self.assertEqual(self.reference(self.data_object.surface),
+                         str(self.data_object))
+
+    def test_block_size_does_not_matter(self):
+        for block_rows in (1, 7, 64, 1000):
+            text = "".join(iter_text(self.data_object.surface, block_rows=block_rows))
+            self.assertEqual(self.reference(self.data_object.surface), text)
+
+    def test_precision(self):
+        text = "".join(iter_text(np.array([[1.23456, 2.0], [3.0, 4.98765]]), precision=2))
+        self.assertEqual("1.23 2.00\n3.00 4.99", text)
+
+    def test_write_text(self):
+        fd = io.StringIO()
+        write_text(self.data_object.surface, fd)
+        rows = fd.getvalue().splitlines()
+        self.assertEqual(100, len(rows))
+        self.assertEqual(100, len(rows[0].split(" ")))
+
+
+class TestBinarySerializers(unittest.TestCase):
+    def setUp(self):
+        self.surface = np.linspace(50, 400, 12).reshape(3, 4)
+
+    def test_float32(self):
+        data = b"".join(serialize(self.surface, 'raw'))
+        np.testing.assert_allclose(
+            self.surface, np.frombuffer(data, dtype='<f4').reshape(3, 4))
+
+    def test_npy(self):
+        data = b"".join(serialize(self.surface, 'npy'))
+        np.testing.assert_array_equal(self.surface, np.load(io.BytesIO(data)))
+
+    def test_gzip(self):
+        data = b"".join(serialize(self.surface, 'gz', precision=3))
+        self.assertEqual("".join(iter_text(self.surface, precision=3)) + "\n",
+                         gzip.decompress(data).decode())
+
+    def test_png(self):
+        data = b"".join(serialize(self.surface, 'png', zmax=450))
+        self.assertEqual(b"\x89PNG\r\n\x1a\n", data[:8])
+        width, height, depth, color = struct.unpack(">IIBB", data[16:26])
+        self.assertEqual((4, 3, 16, 0), (width, height, depth, color))
+        rows = np.frombuffer(zlib.decompress(self.idat(data)), dtype=np.uint8).reshape(3, 9)
+        self.assertTrue((rows[:, 0] == 0).all())
+        heights = rows[:, 1:].copy().view('>u2') / 65535 * 450
+        np.testing.assert_allclose(self.surface, heights, atol=0.01)
+
+    def idat(self, data):
+        """The compressed pixels, from all the IDAT chunks."""
+        chunks, start = [], 8
+        while start < len(data):
+            length, kind = struct.unpack(">I4s", data[start:start + 8])
+            if kind == b"IDAT":
+                chunks.append(data[start + 8:start + 8 + length])
+            start += 12 + length
+        return b"".join(chunks)
+
+    def test_in_blocks(self):
+        surface = np.linspace(50, 400, 100 * 30).reshape(100, 30)
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, surface)
+        self.assertEqual(buffer.getvalue(), b"".join(serialize(surface, 'npy')))
+        data = b"".join(serialize(surface, 'png', zmax=450))
+        self.assertGreater(data.count(b"IDAT"), 1)
+        pixels = np.frombuffer(zlib.decompress(self.idat(data)), dtype=np.uint8)
+        np.testing.assert_allclose(surface, pixels.reshape(100, 61)[:, 1:].copy().view('>u2')
+                                   / 65535 * 450, atol=0.01)
+
+    def test_unknown_format(self):
+        with self.assertRaisesRegex(ValueError, "unknown format"):
+            serialize(self.surface, 'kittens')
+
+
+if __name__ == '__main__':
+    unittest.main()
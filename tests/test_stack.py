@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+from make_a_data_object.resampling import resample
+from make_a_data_object.stack import build_stack, resample_rows
+
+
+class TestStack(unittest.TestCase):
+    def setUp(self):
+        self.param_sets = [
+            dict(abstract=Data.a, precipitation=Data.p, daylength=12),
+            dict(abstract="kittens are fluffy and very nice", precipitation=Data.p, daylength=9.5),
+            dict(abstract=Data.a[:200], precipitation=[1, 0, 2, 5, 3], daylength=12),
+            dict(abstract=Data.a[100:], precipitation=Data.p, daylength=[8, 9, 10, 11, 12, 13, 14]),
+        ]
+
+    def test_same_as_constructor(self):
+        for cls in (DataObject, AdditiveDataObject):
+            for method in ('separable', 'dense'):
+                for alpha in (None, 3):
+                    options = dict(size=80, border=8, limit=20, alpha=alpha, method=method)
+                    stack = build_stack(self.param_sets, cls=cls, **options)
+                    self.assertEqual((4, 80, 80), stack.shape)
+                    for params, surface in zip(self.param_sets, stack):
+                        expected = cls(**params, **options).surface
+                        np.testing.assert_allclose(expected, surface, atol=1e-9)
+
+    def test_float32(self):
+        stack = build_stack(self.param_sets, size=80, border=8, alpha=3, dtype=np.float32)
+        self.assertEqual(np.float32, stack.dtype)
+
+    def test_resample_rows(self):
+        vectors = [[1, 2, 3, 4], [0, 1, 0, 1, 0], [4, 3, 2, 1]]
+        resampled = resample_rows(vectors, 30)
+        self.assertEqual((3, 30), resampled.shape)
+        for vector, row in zip(vectors, resampled):
+            np.testing.assert_allclose(resample(vector, 30), row)
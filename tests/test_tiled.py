@@ -0,0 +1,61 @@
+import gc
+import os
+import tempfile
+import unittest
+import warnings
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+from make_a_data_object.tiled import tiled_data_object
+
+
+class TestTiledDataObject(unittest.TestCase):
+    def test_same_as_constructor(self):
+        for cls in (DataObject, AdditiveDataObject):
+            for method in ('separable', 'dense'):
+                for alpha in (None, 2, 5):
+                    params = dict(size=100, border=10, limit=20, alpha=alpha, method=method)
+                    expected = cls(Data.a, Data.p, 12, **params)
+                    tiled = tiled_data_object(Data.a, Data.p, 12, cls=cls, block_rows=7, **params)
+                    self.assertIsInstance(tiled, cls)
+                    self.assertIsInstance(tiled.surface, np.memmap)
+                    np.testing.assert_allclose(expected.surface, tiled.surface, atol=1e-9)
+
+    def test_complement_is_mapped_too(self):
+        expected = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5)
+        tiled = tiled_data_object(Data.a, Data.p, 12, size=100, border=10, alpha=5, block_rows=16)
+        complement = tiled.get_complement(block_rows=16)
+        self.assertIsInstance(complement, np.memmap)
+        np.testing.assert_allclose(expected.get_complement(), complement, atol=1e-9)
+
+    def test_temporary_files_are_closed(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            tiled = tiled_data_object(Data.a, Data.p, 12, size=64, border=4)
+            complement = tiled.get_complement()
+            self.assertEqual(64 * 64, np.count_nonzero(complement + tiled.surface))
+            del tiled, complement
+            gc.collect()
+        self.assertEqual([], [w for w in caught if issubclass(w.category, ResourceWarning)])
+
+    def test_mapped_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'surface.f32')
+            tiled = tiled_data_object(Data.a, Data.p, 12, filename=filename, size=64,
+                                      border=4, dtype=np.float32)
+            mapped = np.memmap(filename, dtype=np.float32, mode='r', shape=(64, 64))
+            np.testing.assert_array_equal(tiled.surface, mapped)
+
+    def test_write(self):
+        expected = AdditiveDataObject(Data.a, Data.p, 12, size=100, border=10, alpha=5)
+        tiled = tiled_data_object(Data.a, Data.p, 12, size=100, border=10, alpha=5, block_rows=9)
+        with tempfile.TemporaryDirectory() as directory:
+            for complement in (False, True):
+                expected.write(os.path.join(directory, 'a.dat'), precision=6, complement=complement)
+                tiled.write(os.path.join(directory, 'b.dat'), precision=6, complement=complement)
+                with open(os.path.join(directory, 'a.dat')) as a, \
+                        open(os.path.join(directory, 'b.dat')) as b:
+                    self.assertEqual(a.read(), b.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
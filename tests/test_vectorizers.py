@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from make_a_data_object.models import AdditiveDataObject, Data, DataObject
+from make_a_data_object.vectorizers import ENCODINGS, character_classes, syllables, vectorize, words
+
+
+def listed(abstract, limit=None):
+    """The vector as DataObject.vectorize_abstract used to make it."""
+    lens = list(map(len, abstract.split()[:limit]))
+    return np.array([np.abs(lens[i - 1] - l) for (i, l) in enumerate(lens)])
+
+
+class TestVectorize(unittest.TestCase):
+    def test_same_as_before(self):
+        for abstract in (Data.a, "kittens", "", "  two\twords\n", "Møde i København i morgen"):
+            for limit in (None, 1, 5, 20, 1000):
+                np.testing.assert_array_equal(listed(abstract, limit), vectorize(abstract, limit))
+
+    def test_reads_only_limit_words(self):
+        self.assertEqual(['Lorem', 'ipsum', 'dolor'], words(Data.a * 1000, 3))
+
+    def test_syllables(self):
+        np.testing.assert_array_equal([2, 1, 3, 0, 3],
+                                      syllables(["kitten", "ok", "beautiful", "42", "øjeblik"]))
+
+    def test_character_classes(self):
+        np.testing.assert_array_equal([[3, 1, 0, 1, 0], [0, 0, 2, 0, 1]],
+                                      character_classes(["Abcd,", "42€"]))
+
+    def test_encodings(self):
+        for encoding in ENCODINGS:
+            vector = vectorize(Data.a, 20, encoding)
+            self.assertEqual((20,), vector.shape)
+            self.assertTrue((vector >= 0).all())
+        np.testing.assert_array_equal([5, 5, 0], vectorize("Ab1 ab1ab1 ab1ab1", encoding='charclass'))
+
+    def test_unknown_encoding(self):
+        with self.assertRaisesRegex(ValueError, "unknown encoding"):
+            vectorize(Data.a, encoding='kittens')
+
+    def test_data_object_encoding(self):
+        for cls in (DataObject, AdditiveDataObject):
+            data_object = cls(Data.a, Data.p, 12, size=100, border=10, limit=20,
+                              encoding='syllables')
+            self.assertFalse(np.array_equal(cls(Data.a, Data.p, 12, size=100, border=10,
+                                                limit=20).abstract, data_object.abstract))
+
+
+if __name__ == '__main__':
+    unittest.main()